@@ -0,0 +1,1051 @@
+"""
+benchmark.py
+Measures pyEngine's performance headlessly, without opening a window or waiting on the clock
+run "python3 benchmark.py" to run the scenario suite, or pass scenario and benchmark names to run only those
+"python3 benchmark.py --json results.json" saves the suite's results and "--compare old.json" compares against saved results
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import pyEngine
+
+
+# ------------------------------------------------------------------------------ #
+#                                    helpers                                     #
+# ------------------------------------------------------------------------------ #
+
+# returns a numRows x numCols tile map with numTiles boundary tiles scattered randomly
+def makeTileMap(numRows, numCols, numTiles, seed=0):
+    rng = random.Random(seed)
+    cells = [1] * numTiles + [0] * (numRows * numCols - numTiles)
+    rng.shuffle(cells)
+    return [cells[r * numCols:(r + 1) * numCols] for r in range(numRows)]
+
+# returns a scene whose bounds map has numTiles tiles at about 50% density
+def makeTileScene(game, numTiles):
+    numCells = numTiles * 2
+    numRows = max(int((numCells * 2 / 3) ** .5), 1)
+    numCols = -(-numCells // numRows)
+
+    map = pyEngine.Map()
+    map.createBoundsMap(makeTileMap(numRows, numCols, numTiles), game)
+    scene = pyEngine.Scene(game, map)
+    scene.drawTiles()
+    return scene
+
+# runs scene for numFrames frames and returns the average ms per frame
+def msPerFrame(scene, numFrames):
+    frameTimes = scene.runFrames(numFrames)
+    return sum(frameTimes) * 1000 / len(frameTimes)
+
+# returns value at fraction q (0 to 1) of sorted values
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+"""
+    runs scene for warmupFrames frames, then times numFrames frames, then traces allocations over allocFrames frames
+    allocation tracing is done separately because tracemalloc slows every allocation down
+    alloc KiB per frame is the average peak of memory allocated while drawing one frame
+    retained KiB is memory still allocated after the traced frames, which grows if a frame leaks
+"""
+
+def measureScene(scene, numFrames=300, warmupFrames=30, allocFrames=30):
+    scene.runFrames(warmupFrames)
+    frameTimes = scene.runFrames(numFrames)
+    totalTime = sum(frameTimes)
+
+    tracemalloc.start()
+    startMemory = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    for i in range(allocFrames):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        scene.runFrames(1)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    retained = tracemalloc.get_traced_memory()[0] - startMemory
+    tracemalloc.stop()
+    scene.stop()
+
+    return {
+        "frames": len(frameTimes),
+        "fps": len(frameTimes) / totalTime,
+        "mean ms": totalTime * 1000 / len(frameTimes),
+        "p50 ms": percentile(frameTimes, .5) * 1000,
+        "p99 ms": percentile(frameTimes, .99) * 1000,
+        "alloc KiB per frame": sum(peaks) / len(peaks) / 1024,
+        "retained KiB": retained / 1024,
+    }
+
+def report(name, results):
+    print(name)
+    for key, value in results.items():
+        if isinstance(value, float):
+            print("    {}: {:.3f}".format(key, value))
+        else:
+            print("    {}: {}".format(key, value))
+
+
+# ------------------------------------------------------------------------------ #
+#                                   scenarios                                    #
+# ------------------------------------------------------------------------------ #
+
+# each scenario builds a scene that the suite runs headlessly with measureScene()
+
+# 2000 placeholder DVD sprites bouncing around the window
+def scenarioBouncingDVDs(game, numSprites=2000):
+    rng = random.Random(10)
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setBoundAction(pyEngine.BOUNCE)
+        sprite.setMotionVector(4, rng.uniform(0, 360))
+        sprite.setPosition((rng.uniform(100, 980), rng.uniform(100, 620)))
+        scene.addSprite(sprite)
+    return scene
+
+# visible bounds map with 2400 tiles and 300 sprites bouncing off of them
+def scenarioDenseBoundsMap(game, numTiles=2400, numSprites=300):
+    rng = random.Random(11)
+    scene = makeTileScene(game, numTiles)
+    scene.map.showTiles()
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setBoundAction(pyEngine.BOUNCE)
+        sprite.setMotionVector(3, rng.uniform(0, 360))
+        sprite.setPosition((rng.uniform(100, 980), rng.uniform(100, 620)))
+        scene.addSprite(sprite)
+    return scene
+
+# 300 labels where one label's text changes every 10 frames
+def scenarioManyLabels(game, numLabels=300):
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    labels = []
+    for i in range(numLabels):
+        label = pyEngine.Label(scene, "Label {}".format(i))
+        label.setPosition((100 + (i % 8) * 120, 30 + (i // 8) * 18))
+        labels.append(label)
+        scene.addSprite(label)
+
+    frames = [0]
+
+    def update__():
+        frames[0] += 1
+        labels[0].text = "Score: {}".format(frames[0] // 10)
+
+    scene.update__ = update__
+    return scene
+
+# 300 runners playing the running animation from runnerSpritesheet.png while moving across the window
+def scenarioAnimatedSprites(game, numSprites=300):
+    rng = random.Random(12)
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setImage("runnerSpritesheet.png")
+        sprite.createAnimation("running", 9, 64, 64, 0, 705, 2)
+        sprite.setCurrentAnimation("running")
+        sprite.playAnimation()
+        sprite.setMotionVector(rng.uniform(1, 5), 0)
+        sprite.setPosition((rng.uniform(0, 1080), rng.uniform(100, 620)))
+        scene.addSprite(sprite)
+    return scene
+
+# runner.py's gameScene
+def scenarioRunner(game):
+    import runner
+    return runner.gameScene(game)
+
+SCENARIOS = {
+    "dvds": scenarioBouncingDVDs,
+    "boundsmap": scenarioDenseBoundsMap,
+    "labels": scenarioManyLabels,
+    "animation": scenarioAnimatedSprites,
+    "runner": scenarioRunner,
+}
+
+# runs each named scenario and returns a dictionary of their results
+def runSuite(game, names, numFrames):
+    results = {}
+    for name in names:
+        results[name] = measureScene(SCENARIOS[name](game), numFrames)
+        report("scenario {}".format(name), results[name])
+    return results
+
+# prints how each scenario's frame times changed compared to results saved in a JSON file
+def compareResults(results, filename):
+    with open(filename) as file:
+        baseline = json.load(file)["scenarios"]
+
+    for name, stats in results.items():
+        if name in baseline:
+            old = baseline[name]
+            report("scenario {} compared to {}".format(name, filename), {
+                "mean ms change %": (stats["mean ms"] / old["mean ms"] - 1) * 100,
+                "p99 ms change %": (stats["p99 ms"] / old["p99 ms"] - 1) * 100,
+                "alloc KiB per frame change": stats["alloc KiB per frame"] - old["alloc KiB per frame"],
+            })
+
+
+# ------------------------------------------------------------------------------ #
+#                                   benchmarks                                   #
+# ------------------------------------------------------------------------------ #
+
+# returns one tile sprite per boundary cell, placed the way scenes placed tiles before cells were merged into rects
+def makeCellTiles(scene):
+    map = scene.map
+    tiles = []
+    for r in range(map.numRows):
+        for c in range(map.numCols):
+            if map.isBoundary(r, c):
+                tile = pyEngine.Sprite(scene)
+                tile.x = (c + .5) * map.tileW
+                tile.y = (r + 1) * map.tileH
+                tile.displayedImgWidth = map.tileW
+                tile.displayedImgHeight = map.tileH
+                tiles.append(tile)
+    return tiles
+
+"""
+    compares the old linear scan over one tile per boundary cell against the bounds map grid index used by
+    Sprite.checkBounds, which looks up the merged tile rects
+    both searches must agree on whether every sprite hits a tile
+"""
+
+def benchTileCollisions(game, tileCounts=(1000, 10000, 100000), numSprites=100):
+    rng = random.Random(1)
+    for numTiles in tileCounts:
+        scene = makeTileScene(game, numTiles)
+        cellTiles = makeCellTiles(scene)
+
+        sprites = []
+        for i in range(numSprites):
+            sprite = pyEngine.Sprite(scene)
+            sprite.setSpeed(rng.uniform(0, 8))
+            sprite.setPosition((rng.uniform(0, game.getWindowWidth()), rng.uniform(0, game.getWindowHeight())))
+            sprites.append(sprite)
+
+        # old scan: test the tile of every boundary cell until one collides
+        start = time.perf_counter()
+        scanHits = []
+        for sprite in sprites:
+            hit = False
+            for tile in cellTiles:
+                if sprite.tileCollision(tile):
+                    hit = True
+                    break
+            scanHits.append(hit)
+        scanTime = time.perf_counter() - start
+
+        # grid index: only test tiles under the sprite's expanded rectangle
+        start = time.perf_counter()
+        gridHits = []
+        for sprite in sprites:
+            hit = False
+            tiles = scene.getTilesNear(
+                sprite.x - (.5 * sprite.displayedImgWidth) - sprite.speed,
+                sprite.y - (.5 * sprite.displayedImgHeight) - sprite.speed,
+                sprite.x + (.5 * sprite.displayedImgWidth) + sprite.speed,
+                sprite.y + (.5 * sprite.displayedImgHeight) + sprite.speed)
+            for tile in tiles:
+                if sprite.tileCollision(tile):
+                    hit = True
+                    break
+            gridHits.append(hit)
+        gridTime = time.perf_counter() - start
+
+        if scanHits != gridHits:
+            raise AssertionError("grid index and linear scan disagree on {} tiles".format(numTiles))
+
+        report("tile collisions: {} tiles merged into {}, {} sprites".format(len(cellTiles), len(scene.tiles), numSprites), {
+            "linear scan ms per sprite": scanTime * 1000 / numSprites,
+            "grid index ms per sprite": gridTime * 1000 / numSprites,
+            "speedup": scanTime / gridTime,
+        })
+
+
+# default bouncing DVD scene presented with full flips and with dirty rect mode
+def benchDirtyRects(game, numFrames=300):
+    results = {}
+    for dirtyRectMode in (False, True):
+        # the game's default bouncing DVD scene, made on this game since a new Game would replace its display
+        scene = pyEngine.Scene(game, pyEngine.Map())
+        sprite = pyEngine.Sprite(scene)
+        sprite.setImage("dvd.jpeg")
+        sprite.setBoundAction(pyEngine.BOUNCE)
+        sprite.setMoveAngle(230)
+        sprite.setSpeed(4)
+        sprite.setPosition((350, 350))
+        scene.addSprite(sprite)
+        scene.setDirtyRectMode(dirtyRectMode)
+
+        fractions = []
+        userUpdate = scene.update__
+
+        def update__():
+            userUpdate()
+            fractions.append(scene.getDirtyFraction())
+
+        scene.update__ = update__
+        mode = "dirty rects" if dirtyRectMode else "full flip"
+        results["{} ms per frame".format(mode)] = msPerFrame(scene, numFrames)
+        results["{} average screen fraction presented".format(mode)] = sum(fractions) / len(fractions)
+
+    report("dirty rect rendering: {} frames".format(numFrames), results)
+
+# spinning sprites that share one image, with the transform cache kept and with it cleared every frame
+def benchRotation(game, numSprites=500, numFrames=200):
+    results = {}
+    for cached in (False, True):
+        pyEngine.transforms.clear()
+        scene = pyEngine.Scene(game, pyEngine.Map())
+        rng = random.Random(2)
+        for i in range(numSprites):
+            sprite = pyEngine.Sprite(scene)
+            sprite.setImage("hurdle.png")
+            sprite.setPosition((rng.uniform(0, 1080), rng.uniform(0, 720)))
+            sprite.setBoundAction(pyEngine.CONTINUE)
+            sprite.setImgAngle(rng.randrange(360))
+            scene.addSprite(sprite)
+
+        def update__():
+            for sprite in scene.sprites:
+                sprite.rotateImg(5)
+            if not cached:
+                pyEngine.transforms.clear()
+
+        scene.update__ = update__
+        key = "cached ms per frame" if cached else "uncached ms per frame"
+        results[key] = msPerFrame(scene, numFrames)
+
+    results.update(pyEngine.transforms.getStats())
+    report("rotation: {} sprites, {} frames".format(numSprites, numFrames), results)
+
+# many HUD labels where only one label's text changes each frame
+def benchLabels(game, numLabels=200, numFrames=200):
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    labels = []
+    for i in range(numLabels):
+        label = pyEngine.Label(scene, "Label {}".format(i))
+        label.setPosition((100 + (i % 8) * 120, 30 + (i // 8) * 28))
+        labels.append(label)
+        scene.addSprite(label)
+
+    frames = [0]
+
+    def update__():
+        frames[0] += 1
+        labels[0].text = "Score: {}".format(frames[0] // 10)
+
+    scene.update__ = update__
+    frameMs = msPerFrame(scene, numFrames)
+
+    renders = 0
+    reuses = 0
+    for label in labels:
+        stats = label.getRenderStats()
+        renders += stats["renders"]
+        reuses += stats["reuses"]
+
+    report("labels: {} labels, {} frames".format(numLabels, numFrames), {
+        "ms per frame": frameMs,
+        "renders": renders,
+        "reuses": reuses,
+    })
+
+"""
+    finds overlapping pairs among 100 to 20k sprites spread out at the same density
+    compares the spatial hash in CollisionWorld against checking every pair, which is only timed on smaller counts
+"""
+
+def benchCollisionWorld(game, spriteCounts=(100, 1000, 5000, 20000), bruteForceLimit=2000, numSteps=5):
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    for numSprites in spriteCounts:
+        rng = random.Random(3)
+        worldSize = int((numSprites * 64 * 64) ** .5)
+        world = pyEngine.CollisionWorld(cellSize=64)
+        sprites = []
+        for i in range(numSprites):
+            sprite = pyEngine.Sprite(scene)
+            sprite.rect = pyEngine.pygame.Rect(rng.randrange(worldSize), rng.randrange(worldSize),
+                                               rng.randrange(8, 40), rng.randrange(8, 40))
+            sprites.append(sprite)
+            world.add(sprite)
+
+        start = time.perf_counter()
+        for i in range(numSteps):
+            world.step()
+        results = {"spatial hash ms per step": (time.perf_counter() - start) * 1000 / numSteps,
+                   "pairs": len(world.pairs)}
+
+        if numSprites <= bruteForceLimit:
+            start = time.perf_counter()
+            pairs = []
+            for i in range(numSprites):
+                for j in range(i + 1, numSprites):
+                    if sprites[i].rect.colliderect(sprites[j].rect):
+                        pairs.append((sprites[i], sprites[j]))
+            results["every pair ms per step"] = (time.perf_counter() - start) * 1000
+            if set(pairs) != world.contacts:
+                raise AssertionError("spatial hash and every pair check disagree on {} sprites".format(numSprites))
+
+        report("collision world: {} sprites".format(numSprites), results)
+
+"""
+    bouncing placeholder DVD sprites as one SpriteBatch compared with the same motion as individual Sprites
+    update times only cover motion and bounds, frame times also include clearing and drawing
+"""
+
+def benchSpriteBatch(game, batchSize=50000, numSprites=2000, numFrames=30):
+    rng = random.Random(4)
+
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setBoundAction(pyEngine.BOUNCE)
+        sprite.setMotionVector(4, rng.uniform(0, 360))
+        sprite.setPosition((rng.uniform(100, 980), rng.uniform(100, 620)))
+        scene.addSprite(sprite)
+    start = time.perf_counter()
+    for i in range(numFrames):
+        for sprite in scene.sprites:
+            sprite.update()
+    spriteUpdateMs = (time.perf_counter() - start) * 1000 / numFrames
+    spriteFrameMs = msPerFrame(scene, numFrames)
+
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    batch = pyEngine.SpriteBatch(scene)
+    batch.addMany([rng.uniform(100, 980) for i in range(batchSize)],
+                  [rng.uniform(100, 620) for i in range(batchSize)],
+                  4, [rng.uniform(0, 360) for i in range(batchSize)], pyEngine.BOUNCE)
+    start = time.perf_counter()
+    for i in range(numFrames):
+        batch.update()
+    batchUpdateMs = (time.perf_counter() - start) * 1000 / numFrames
+    scene.addBatch(batch)
+    batchFrameMs = msPerFrame(scene, numFrames)
+
+    report("sprite batch: {} frames".format(numFrames), {
+        "{} Sprites update us per sprite".format(numSprites): spriteUpdateMs * 1000 / numSprites,
+        "{} Sprites frame ms".format(numSprites): spriteFrameMs,
+        "{} batched update us per sprite".format(batchSize): batchUpdateMs * 1000 / batchSize,
+        "{} batched update ms".format(batchSize): batchUpdateMs,
+        "{} batched frame ms".format(batchSize): batchFrameMs,
+    })
+
+# spawns sprites that share one image and font, the shared resource cache should only decode each once
+def benchSharedResources(game, numSprites=10000):
+    pyEngine.resources.clear()
+    scene = pyEngine.Scene(game, pyEngine.Map())
+
+    start = time.perf_counter()
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setImage("dvd.jpeg")
+    spawnTime = time.perf_counter() - start
+
+    stats = pyEngine.resources.getStats()
+    report("shared resources: {} sprites".format(numSprites), {
+        "us per sprite": spawnTime * 1000000 / numSprites,
+        "decodes (cache misses)": stats["misses"],
+        "cache hits": stats["hits"],
+        "cached bytes": stats["memoryUsed"],
+    })
+
+# animation cell memory and creation time for few and many runners sharing one spritesheet layout
+def benchAnimationClips(game, spriteCounts=(10, 500)):
+    results = {}
+    for numSprites in spriteCounts:
+        pyEngine.clips.clear()
+        scene = pyEngine.Scene(game, pyEngine.Map())
+        start = time.perf_counter()
+        for i in range(numSprites):
+            sprite = pyEngine.Sprite(scene)
+            sprite.setImage("runnerSpritesheet.png")
+            sprite.createAnimation("running", 9, 64, 64, 0, 705, 2)
+        elapsed = time.perf_counter() - start
+        stats = pyEngine.clips.getStats()
+        results["{} sprites us per createAnimation".format(numSprites)] = elapsed * 1000000 / numSprites
+        results["{} sprites cell surfaces".format(numSprites)] = stats["frames"]
+        results["{} sprites cell KiB".format(numSprites)] = stats["frameMemory"] / 1024
+    report("animation clips", results)
+
+# hundreds of distinct small images as standalone surfaces and packed into a texture atlas
+def benchAtlas(game, numImages=400, numFrames=200):
+    rng = random.Random(0)
+    surfaces = []
+    for i in range(numImages):
+        surface = pyEngine.pygame.Surface((rng.randint(8, 64), rng.randint(8, 64)), pyEngine.pygame.SRCALPHA).convert_alpha()
+        surface.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256), 255))
+        surfaces.append(surface)
+    positions = [(rng.randrange(1000), rng.randrange(650)) for surface in surfaces]
+
+    start = time.perf_counter()
+    atlas = pyEngine.TextureAtlas(maxSize=1024)
+    for i, surface in enumerate(surfaces):
+        atlas.addSurface(i, surface)
+    atlas.build()
+    buildTime = time.perf_counter() - start
+    regions = [atlas.get(i) for i in range(numImages)]
+
+    results = {"build ms": buildTime * 1000}
+    for name, images in (("standalone", surfaces), ("atlas", regions)):
+        start = time.perf_counter()
+        for frame in range(numFrames):
+            game.window.blits(list(zip(images, positions)), False)
+        results["{} ms per frame".format(name)] = (time.perf_counter() - start) * 1000 / numFrames
+
+    stats = atlas.getStats()
+    results["standalone surfaces"] = numImages
+    results["atlas pages"] = stats["pages"]
+    results["packing efficiency"] = stats["efficiency"]
+    results["standalone texture KiB"] = sum(pyEngine.surfaceSize(surface) for surface in surfaces) / 1024
+    results["atlas texture KiB"] = stats["textureMemory"] / 1024
+    report("texture atlas: {} images".format(numImages), results)
+
+# a camera following a fast sprite across worlds of increasing size, chunks are filled with a color on demand
+def benchCamera(game, worldSizes=(2000, 20000, 200000), numSprites=200, numFrames=300):
+    class ColorMap(pyEngine.Map):
+        def createChunk__(self, chunkX, chunkY, rect):
+            chunk = pyEngine.pygame.Surface(rect.size).convert()
+            chunk.fill(((chunkX * 37) % 256, (chunkY * 59) % 256, 120))
+            return chunk
+
+    results = {}
+    for worldSize in worldSizes:
+        rng = random.Random(0)
+        worldMap = ColorMap()
+        worldMap.setWorldSize(worldSize, worldSize)
+        scene = pyEngine.Scene(game, worldMap)
+        camera = scene.setCamera()
+        for i in range(numSprites):
+            sprite = pyEngine.Sprite(scene)
+            sprite.setImage("hurdle.png")
+            sprite.x = rng.randrange(worldSize)
+            sprite.y = rng.randrange(worldSize)
+            sprite.setSpeed(rng.randint(1, 5))
+            sprite.setMoveAngle(rng.randrange(360))
+            sprite.setBoundAction(pyEngine.BOUNCE)
+            scene.addSprite(sprite)
+        player = pyEngine.Sprite(scene)
+        player.setImage("hurdle.png")
+        player.x = player.y = 100
+        player.setSpeed(15)
+        player.setMoveAngle(315)
+        player.setBoundAction(pyEngine.BOUNCE)
+        scene.addSprite(player)
+        camera.follow(player)
+
+        scene.runFrames(10)
+        elapsed = msPerFrame(scene, numFrames)
+        results["{}px world ms per frame".format(worldSize)] = elapsed
+        results["{}px world chunks loaded".format(worldSize)] = worldMap.getNumLoadedChunks()
+
+    # a plain Camera(width, height) has no world size, so sprites and batches are not bounded at all
+    rng = random.Random(0)
+    scene = pyEngine.Scene(game, ColorMap())
+    camera = scene.setCamera(pyEngine.Camera(game.getWindowWidth(), game.getWindowHeight()))
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        sprite.setImage("hurdle.png")
+        sprite.x = rng.randrange(game.getWindowWidth())
+        sprite.y = rng.randrange(game.getWindowHeight())
+        sprite.setSpeed(rng.randint(1, 5))
+        sprite.setMoveAngle(rng.randrange(360))
+        sprite.setBoundAction((pyEngine.BOUNCE, pyEngine.WRAP, pyEngine.STOP)[i % 3])
+        scene.addSprite(sprite)
+    if pyEngine.numpy != None:
+        batch = pyEngine.SpriteBatch(scene)
+        batch.addMany([rng.uniform(0, 1000) for i in range(numSprites)], [rng.uniform(0, 700) for i in range(numSprites)],
+                      4, [rng.uniform(0, 360) for i in range(numSprites)], pyEngine.BOUNCE)
+        scene.update__ = batch.update
+    camera.follow(scene.sprites[0])
+    results["unbounded world ms per frame"] = msPerFrame(scene, numFrames)
+    report("camera: {} sprites scrolling {} frames".format(numSprites, numFrames), results)
+
+# a pool of mostly hidden sprites against a scene holding only the shown ones, and a world culled around a camera
+def benchSleeping(game, numShown=200, poolSize=10000, numFrames=200):
+    results = {}
+    for total in (numShown, poolSize):
+        scene = pyEngine.Scene(game, pyEngine.Map())
+        for i in range(total):
+            sprite = pyEngine.Sprite(scene)
+            sprite.x = 100 + (i % 800)
+            sprite.y = 100 + ((i // 800) % 500)
+            sprite.setSpeed(2)
+            sprite.setMoveAngle(i % 360)
+            scene.addSprite(sprite)
+            if i >= numShown:
+                sprite.hide()
+        scene.runFrames(10)
+        results["{} shown of {} ms per frame".format(numShown, total)] = msPerFrame(scene, numFrames)
+
+    for simulateOffscreen in (True, False):
+        worldMap = pyEngine.Map()
+        worldMap.setWorldSize(20000, 20000)
+        scene = pyEngine.Scene(game, worldMap)
+        scene.setCamera()
+        scene.setCulling(True, simulateOffscreen, margin=100)
+        for i in range(poolSize):
+            sprite = pyEngine.Sprite(scene)
+            sprite.x = (i * 97) % 20000
+            sprite.y = (i * 61) % 20000
+            sprite.setSpeed(1)
+            sprite.setMoveAngle(i % 360)
+            scene.addSprite(sprite)
+        scene.runFrames(10)
+        name = "simulated" if simulateOffscreen else "frozen"
+        results["{} sprites in world, off-screen {}, ms per frame".format(poolSize, name)] = msPerFrame(scene, numFrames)
+        results["{} sprites in world, off-screen {}, updated".format(poolSize, name)] = scene.getSpriteCounts()["active"]
+
+    # a hidden sprite sleeps where it is not updated, its rect must still leave the screen so nothing collides with it
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    shown = pyEngine.Sprite(scene)
+    hidden = pyEngine.Sprite(scene)
+    for sprite in (shown, hidden):
+        sprite.setPosition((100, 100))
+        scene.addSprite(sprite)
+    scene.runFrames(2)
+    hidden.hide()
+    scene.runFrames(2)
+    if shown.collidesWith(hidden):
+        raise AssertionError("a hidden sprite still collides at {}".format(hidden.rect))
+    hidden.show()
+    if not shown.collidesWith(hidden):
+        raise AssertionError("a shown sprite does not collide at {}".format(hidden.rect))
+
+    report("sleeping and culled sprites", results)
+
+# retained memory and construction time of plain sprites and labels
+def benchSpriteCore(game, numSprites=20000):
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    pyEngine.Sprite(scene)
+    pyEngine.Label(scene)
+    results = {}
+    for name, spriteClass, count in (("Sprite", pyEngine.Sprite, numSprites), ("Label", pyEngine.Label, numSprites // 10)):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        sprites = [spriteClass(scene) for i in range(count)]
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del sprites
+
+        start = time.perf_counter()
+        sprites = [spriteClass(scene) for i in range(count)]
+        elapsed = time.perf_counter() - start
+        del sprites
+        results["{} bytes per sprite".format(name)] = retained / count
+        results["{} us per construction".format(name)] = elapsed * 1000000 / count
+    report("sprite core: {} sprites".format(numSprites), results)
+
+# boundary cells against merged collision tiles for runner.py's floor, a walled level with platforms, and random noise
+def benchMergedTiles(game):
+    import runner
+
+    levels = {"runner.py floor": runner.gameScene(game).map.tileMap}
+    numRows, numCols = 60, 80
+    level = [[1 if (r in (0, numRows - 1)) or (c in (0, numCols - 1)) else 0 for c in range(numCols)]
+             for r in range(numRows)]
+    for platform in range(12):
+        r = 5 + (platform * 4)
+        for c in range(5 + ((platform * 7) % 40), 25 + ((platform * 7) % 40)):
+            level[r][c] = 1
+            level[r + 1][c] = 1
+    levels["walled level with platforms"] = level
+    levels["random 50% noise"] = makeTileMap(numRows, numCols, (numRows * numCols) // 2)
+
+    results = {}
+    for name, tileMap in levels.items():
+        worldMap = pyEngine.Map()
+        start = time.perf_counter()
+        worldMap.createBoundsMap(tileMap, game)
+        elapsed = time.perf_counter() - start
+        scene = pyEngine.Scene(game, worldMap)
+        scene.buildTiles()
+        results["{} boundary cells".format(name)] = worldMap.numTiles
+        results["{} collision tiles".format(name)] = len(scene.tiles)
+        results["{} createBoundsMap ms".format(name)] = elapsed * 1000
+    report("merged bounds map tiles", results)
+
+# rect collisions against pixel-perfect collisions with cached masks and with a mask built for every check
+def benchMasks(game, numSprites=200, numChecks=20000):
+    rng = random.Random(0)
+    scene = pyEngine.Scene(game, pyEngine.Map())
+    sprites = []
+    for i in range(numSprites):
+        sprite = pyEngine.Sprite(scene)
+        if i % 2:
+            sprite.setImage("hurdle.png")
+        else:
+            # runners show one of the cells of the running animation
+            sprite.setImage("runnerSpritesheet.png")
+            sprite.createAnimation("running", 9, 64, 64, 0, 705, 2)
+            sprite.setImageSurface(sprite.animations["running"][i % 9])
+        sprite.setImgAngle(rng.choice((0, 15, 30)))
+        sprite.update()
+        sprite.rect.center = (rng.randrange(300), rng.randrange(300))
+        sprites.append(sprite)
+    pairs = [(rng.choice(sprites), rng.choice(sprites)) for i in range(numChecks)]
+
+    start = time.perf_counter()
+    rectHits = sum(1 for a, b in pairs if a.collidesWith(b))
+    rectTime = time.perf_counter() - start
+
+    def uncachedOverlap(a, b):
+        if not a.rect.colliderect(b.rect):
+            return False
+        offset = (b.rect.left - a.rect.left, b.rect.top - a.rect.top)
+        return pyEngine.pygame.mask.from_surface(a.image).overlap(pyEngine.pygame.mask.from_surface(b.image), offset) != None
+
+    start = time.perf_counter()
+    uncachedHits = sum(1 for a, b in pairs if uncachedOverlap(a, b))
+    uncachedTime = time.perf_counter() - start
+
+    pyEngine.masks.clear()
+    for sprite in sprites:
+        sprite.setPixelPerfect()
+    start = time.perf_counter()
+    pixelHits = sum(1 for a, b in pairs if a.collidesWith(b))
+    pixelTime = time.perf_counter() - start
+
+    if pixelHits != uncachedHits:
+        raise AssertionError("cached and uncached masks disagree")
+    stats = pyEngine.masks.getStats()
+    report("pixel masks: {} checks between {} sprites".format(numChecks, numSprites), {
+        "rect us per check": rectTime * 1000000 / numChecks,
+        "cached mask us per check": pixelTime * 1000000 / numChecks,
+        "mask per check us per check": uncachedTime * 1000000 / numChecks,
+        "rect hits": rectHits,
+        "pixel hits": pixelHits,
+        "rect hits rejected by masks": stats["rejected"],
+        "masks built": stats["misses"],
+        "mask cache hits": stats["hits"],
+    })
+
+# sprites stopping at a thin wall and sliding past it, with speed-expanded tile tests and with swept collisions
+def benchSweptCollisions(game, speeds=(4, 15, 40, 90), numSprites=50, numFrames=40):
+    tileMap = [[0] * 100 for r in range(60)]
+    for row in tileMap:
+        row[50] = 1
+    worldMap = pyEngine.Map()
+    worldMap.createBoundsMap(tileMap, game, tileWidth=10, tileHeight=12)
+    wallLeft = 500
+
+    rng = random.Random(0)
+    results = {}
+    for swept in (False, True):
+        name = "swept" if swept else "expanded"
+        for speed in speeds:
+            scene = pyEngine.Scene(game, worldMap)
+            movers = []
+            sliders = []
+            for i in range(numSprites):
+                # movers head right into the wall, sliders move down beside it with a gap smaller than their speed
+                mover = pyEngine.Sprite(scene)
+                mover.setImage("hurdle.png")
+                mover.setBoundAction(pyEngine.STOP)
+                mover.setSweptCollisions(swept)
+                mover.update()
+                mover.x = wallLeft - (.5 * mover.displayedImgWidth) - rng.uniform(1, min(speed * (numFrames // 2), 400))
+                mover.y = 100 + (i * 10)
+                mover.setMotionVector(speed, 0)
+                movers.append(mover)
+
+                slider = pyEngine.Sprite(scene)
+                slider.setImage("hurdle.png")
+                slider.setBoundAction(pyEngine.STOP)
+                slider.setSweptCollisions(swept)
+                slider.update()
+                sliderSpeed = min(speed, 10)
+                slider.x = wallLeft - (.5 * slider.displayedImgWidth) - rng.uniform(1, sliderSpeed)
+                slider.y = 40
+                slider.setMotionVector(sliderSpeed, 270)
+                sliders.append(slider)
+            for sprite in movers + sliders:
+                scene.addSprite(sprite)
+
+            start = time.perf_counter()
+            scene.runFrames(numFrames)
+            elapsed = time.perf_counter() - start
+
+            gaps = [wallLeft - (mover.x + (.5 * mover.displayedImgWidth)) for mover in movers]
+            results["{} speed {} mean gap at stop px".format(name, speed)] = sum(abs(gap) for gap in gaps) / numSprites
+            results["{} speed {} passed through wall".format(name, speed)] = sum(1 for mover in movers if mover.x > wallLeft + 10)
+            results["{} speed {} sliders stopped".format(name, speed)] = sum(1 for slider in sliders if slider.speed == 0)
+            results["{} speed {} ms per frame".format(name, speed)] = elapsed * 1000 / numFrames
+    report("swept collisions: {} movers and {} sliders against a 10px wall".format(numSprites, numSprites), results)
+
+# time until runner.py shows its first frame, creating its scenes directly and behind a LoadingScene
+def benchPreload(game, numRuns=5):
+    import runner
+
+    def createScenes():
+        game.addScene("startScene", runner.startScene(game))
+        game.addScene("gameScene", runner.gameScene(game))
+        return "startScene"
+
+    directTimes = []
+    firstFrameTimes = []
+    switchTimes = []
+    for i in range(numRuns):
+        pyEngine.resources.clear()
+        start = time.perf_counter()
+        game.setCurrentScene(createScenes())
+        game.runFrames(1)
+        directTimes.append(time.perf_counter() - start)
+
+        pyEngine.resources.clear()
+        loader = pyEngine.AssetLoader()
+        loader.addImages(["stadium.jpeg", "track.jpeg"], alpha=False)
+        loader.addImages(["runnerSpritesheet.png", "hurdle.png"])
+        loader.addSound("Jump.wav")
+        loading = pyEngine.LoadingScene(game, loader, createScenes)
+        start = time.perf_counter()
+        game.setCurrentScene(loading)
+        game.runFrames(1)
+        firstFrameTimes.append(time.perf_counter() - start)
+        while game.currentScene is loading:
+            game.runFrames(1)
+        game.runFrames(1)
+        switchTimes.append(time.perf_counter() - start)
+
+    report("preloading: runner.py, median of {} runs".format(numRuns), {
+        "direct ms to first frame": percentile(directTimes, 50) * 1000,
+        "loading scene ms to first frame": percentile(firstFrameTimes, 50) * 1000,
+        "loading scene ms to first runner frame": percentile(switchTimes, 50) * 1000,
+    })
+
+# two scenes that push and pop each other every frame, checking stack depth and memory stay flat
+def benchSceneStack(game, numTransitions=5000):
+    depths = set()
+
+    class StackScene(pyEngine.Scene):
+        def update__(self):
+            depths.add(len(inspect.stack(0)))
+            if len(self.game.getSceneStack()) == 1:
+                self.game.pushScene(popped)
+            else:
+                self.game.popScene(release=True)
+
+    base = StackScene(game, pyEngine.Map())
+    popped = StackScene(game, pyEngine.Map())
+    for scene in (base, popped):
+        scene.addSprite(pyEngine.Label(scene, "scene"))
+    game.setCurrentScene(base)
+    game.runFrames(100)
+
+    tracemalloc.start()
+    game.runFrames(numTransitions // 2)
+    halfway = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    game.runFrames(numTransitions // 2)
+    elapsed = time.perf_counter() - start
+    end = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    report("scene stack: {} push/pop transitions".format(numTransitions), {
+        "ms per transition": elapsed * 1000 / (numTransitions // 2),
+        "stack depth range": max(depths) - min(depths),
+        "memory growth KiB over second half": (end - halfway) / 1024,
+    })
+
+# policy for runner.py's simulated scene, jumps once the hurdle is close, module level so workers can unpickle it
+def jumpNearHurdle(observation):
+    y, dy, hurdleX = observation
+    return 0 < hurdleX - 150 < 120
+
+"""
+    steps per second of runner.py's scene played frame by frame, stepped in process, and stepped by worker processes
+    worker counts go up to one per CPU, throughput can only grow with workers while there are free cores
+"""
+
+def benchVectorRunner(game, numEnvs=8, numSteps=1000):
+    import runner
+
+    scene = runner.gameScene(game)
+    frameTimes = scene.runFrames(numSteps)
+    scene.stop()
+    results = {"runFrames steps/s": len(frameTimes) / sum(frameTimes)}
+
+    env = pyEngine.SceneEnv(runner.gameScene, game)
+    env.reset()
+    start = time.perf_counter()
+    for i in range(numSteps):
+        env.step(jumpNearHurdle(env.observation))
+        if env.isDone():
+            env.reset()
+    results["SceneEnv steps/s"] = numSteps / (time.perf_counter() - start)
+
+    numCPUs = os.cpu_count() or 1
+    for numProcesses in sorted(set([1, 2, numCPUs])):
+        with pyEngine.VectorSceneRunner(runner.gameScene, numEnvs, numProcesses) as vector:
+            vector.run(10, jumpNearHurdle)
+            start = time.perf_counter()
+            vector.run(numSteps // numEnvs * numProcesses, jumpNearHurdle)
+            elapsed = time.perf_counter() - start
+        results["{} workers steps/s".format(numProcesses)] = (numSteps // numEnvs * numProcesses) * numEnvs / elapsed
+
+    report("vector runner: runner.py, {} envs, {} CPUs".format(numEnvs, numCPUs), results)
+
+# writes a log of numFrames runner.py frames that holds space on a frame every one to four seconds, seeded with seed
+def writeRunnerSession(filename, numFrames, framerate, seed=0):
+    rng = random.Random(seed)
+    spaceScancode = 44
+    jump = [pyEngine.pygame.event.Event(pyEngine.pygame.KEYDOWN, key=pyEngine.pygame.K_SPACE, mod=0,
+                                        scancode=spaceScancode, unicode=" ")]
+    released = [False] * 512
+    pressed = list(released)
+    pressed[spaceScancode] = True
+
+    recorder = pyEngine.InputRecorder(filename, seed, 1 / framerate)
+    nextJump = 0
+    for i in range(numFrames):
+        if i == nextJump:
+            nextJump += rng.randint(framerate, 4 * framerate)
+            recorder.recordFrame(jump, 1, pressed, (0, 0), (False, False, False))
+        else:
+            recorder.recordFrame([], 1, released, (0, 0), (False, False, False))
+    recorder.close()
+
+"""
+    records a recordSeconds runner.py session with Scene.startRecording() and stopRecording(), then replays it with
+    Scene.runReplay(), which must end in the recorded state with the runner at the same height every frame
+    the dummy video driver has no keyboard, so the recorded session's space presses come from a scripted log played
+    through the main loop while the scene records its own input
+    then replays a minutes long scripted session twice, both replays must end in the same state,
+    real time x is how many times faster than the session the replay ran
+"""
+
+def benchReplay(game, minutes=5, recordSeconds=10, framerate=30):
+    import runner
+    import tempfile
+
+    # runner.py's scene, keeping the runner's height after every update
+    class TracedScene(runner.gameScene):
+        def __init__(self, game):
+            runner.gameScene.__init__(self, game)
+            self.heights = []
+
+        def update__(self):
+            runner.gameScene.update__(self)
+            self.heights.append(self.runner.y)
+
+    directory = tempfile.TemporaryDirectory()
+    results = {}
+
+    scripted = os.path.join(directory.name, "scripted.pyin")
+    writeRunnerSession(scripted, recordSeconds * framerate, framerate)
+    recorded = os.path.join(directory.name, "recorded.pyin")
+    scene = TracedScene(game)
+    scene.setFramerate(framerate)
+    scene.startReplay(scripted)
+    scene.startRecording(recorded, seed=0)
+    scene.throttle = False
+    while scene.isReplaying():
+        scene.runFrame()
+    scene.stopRecording()
+    if min(scene.heights) >= 520:
+        raise AssertionError("the runner never left the ground while recording")
+
+    replayed = TracedScene(game)
+    start = time.perf_counter()
+    replay = replayed.runReplay(recorded)
+    elapsed = time.perf_counter() - start
+    if not replay.matches():
+        raise AssertionError("replay ended in {} instead of the recorded {}".format(
+            replay.getReplayedState(), replay.getRecordedState()))
+    if replayed.heights != scene.heights:
+        raise AssertionError("replayed runner heights differ from the recorded session")
+    results["recorded session frames"] = replay.getNumFrames()
+    results["recorded session frames in the air"] = sum(1 for height in scene.heights if height < 520)
+    results["recorded session replay seconds"] = elapsed
+    results["recorded session replay matches"] = replay.matches()
+
+    # a long scripted session
+    numFrames = minutes * 60 * framerate
+    filename = os.path.join(directory.name, "session.pyin")
+    writeRunnerSession(filename, numFrames, framerate)
+
+    states = []
+    replayTimes = []
+    for i in range(2):
+        scene = runner.gameScene(game)
+        start = time.perf_counter()
+        replay = scene.runReplay(filename)
+        replayTimes.append(time.perf_counter() - start)
+        states.append(replay.getReplayedState())
+    if states[0] != states[1]:
+        raise AssertionError("two replays of one log ended in {} and {}".format(states[0], states[1]))
+
+    results["{} minute session frames".format(minutes)] = numFrames
+    results["{} minute session log KiB".format(minutes)] = os.path.getsize(filename) / 1024
+    results["{} minute session replay seconds".format(minutes)] = min(replayTimes)
+    results["{} minute session real time x".format(minutes)] = (numFrames / framerate) / min(replayTimes)
+    report("replay: runner.py sessions", results)
+    directory.cleanup()
+
+# micro benchmarks that measure a single part of the engine and print their own results
+BENCHMARKS = {
+    "tiles": benchTileCollisions,
+    "resources": benchSharedResources,
+    "dirty": benchDirtyRects,
+    "rotation": benchRotation,
+    "labelcache": benchLabels,
+    "collisions": benchCollisionWorld,
+    "batch": benchSpriteBatch,
+    "scenes": benchSceneStack,
+    "preload": benchPreload,
+    "atlas": benchAtlas,
+    "clips": benchAnimationClips,
+    "camera": benchCamera,
+    "sleeping": benchSleeping,
+    "spritecore": benchSpriteCore,
+    "mergedtiles": benchMergedTiles,
+    "masks": benchMasks,
+    "swept": benchSweptCollisions,
+    "vector": benchVectorRunner,
+    "replay": benchReplay,
+}
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Measures pyEngine's performance headlessly.")
+    parser.add_argument("names", nargs="*",
+                        help="scenarios ({}) or benchmarks ({}) to run, runs every scenario by default".format(
+                            ", ".join(SCENARIOS), ", ".join(BENCHMARKS)))
+    parser.add_argument("--frames", type=int, default=300, help="frames to time in each scenario")
+    parser.add_argument("--json", help="file to save scenario results to")
+    parser.add_argument("--compare", help="file of saved scenario results to compare against")
+    options = parser.parse_args(args)
+
+    game = pyEngine.Game(headless=True)
+    names = options.names or list(SCENARIOS)
+    for name in names:
+        if (name not in SCENARIOS) and (name not in BENCHMARKS):
+            parser.error("unknown scenario or benchmark: {}".format(name))
+
+    for name in names:
+        if name in BENCHMARKS:
+            BENCHMARKS[name](game)
+
+    results = runSuite(game, [name for name in names if name in SCENARIOS], options.frames)
+    if options.json:
+        with open(options.json, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "pygame": pyEngine.pygame.version.ver,
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "scenarios": results,
+            }, file, indent=4)
+    if options.compare:
+        compareResults(results, options.compare)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
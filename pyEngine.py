@@ -5,9 +5,28 @@ Simplifies creating 2D game projects
 
 import pygame
 import math
+import os
+import sys
+import random
+import time
+import io
+import json
+import multiprocessing
+import struct
+import traceback
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
 pygame.init()
 
+# numpy is only needed for SpriteBatch
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # ----------------------------- create constants ----------------------------- #
 # bounds constants
 WRAP = 0
@@ -16,13 +35,30 @@ STOP = 2
 HIDE = 3
 CONTINUE = 4
 
+# collision layer mask that collides with every layer
+ALL_LAYERS = 0xFFFFFFFF
+
+# phases of a scene's main loop timed by FrameProfiler, in the order they run
+PROFILER_PHASES = ("clock", "events", "update__", "tiles", "clear", "update", "draw", "present", "collisions")
+
+# color used for the empty cells of a scene's cached tile layer
+TILE_LAYER_COLORKEY = (255, 0, 255)
+
 class Game(object):
-    def __init__(self):
+    # headless runs without a window or sound device using SDL's dummy drivers, used for benchmarks and tests
+    def __init__(self, headless=False):
         # ------------------------------ initialize app ------------------------------ #
+        self.headless = headless
+        if headless:
+            self.__useDummyDrivers()
         pygame.init()
         self.window = pygame.display.set_mode((1080, 720))
         self.setTitle("PyEngine is working!")
         self.scenes = {}
+        self.currentScene = None  # scene on top of the scene stack
+        self.sceneStack = []  # scenes entered but not yet popped, the top scene is the one running
+        self.sceneChanges = []  # (action, scene, release) changes made while running, applied between frames
+        self.running = False
 
         # ------------------------------- default game ------------------------------- #
         # default map
@@ -43,17 +79,74 @@ class Game(object):
         self.addScene("sampleScene", sampleScene)
         self.setCurrentScene("sampleScene")
 
+    """
+        the game's only main loop, runs one frame of the top scene of the scene stack at a time
+        scene changes made during a frame are applied after it, so changing scenes never nests loops
+        ends when the running scene is stopped, the window is closed, or the scene stack is emptied
+    """
+
     def start(self):
-        self.currentScene.start()
+        if self.running:
+            return
+        if not self.sceneStack:
+            self.__enterScene(self.currentScene)
+
+        self.running = True
+        while self.running:
+            scene = self.currentScene
+            scene.runFrame()
+            if not self.running:
+                break
+            if self.sceneChanges:
+                self.__applySceneChanges()
+            elif not scene.keepGoing:
+                self.running = False
+        self.running = False
 
     def stop(self):
-        self.currentScene.stop()
+        self.running = False
+        if self.currentScene != None:
+            self.currentScene.stop()
+
+    # runs the scene stack for numFrames frames as fast as possible, returns list of each frame's time in seconds
+    # scene changes are applied between frames like start() does
+    def runFrames(self, numFrames):
+        if not self.sceneStack:
+            self.__enterScene(self.currentScene)
+        frameTimes = []
+        self.running = True
+        for i in range(numFrames):
+            scene = self.currentScene
+            frameTimes.extend(scene.runFrames(1))
+            if not self.running:
+                break
+            if self.sceneChanges:
+                self.__applySceneChanges()
+            elif not scene.keepGoing:
+                break
+        self.running = False
+        return frameTimes
+
+    # restarts pygame's display and mixer with SDL's dummy drivers
+    def __useDummyDrivers(self):
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+        pygame.display.quit()
+        pygame.mixer.quit()
 
     def addScene(self, sceneKey, scene):
         self.scenes[sceneKey] = scene
 
+    # makes sceneKey's scene the only scene on the scene stack, sceneKey can also be a scene
     def setCurrentScene(self, sceneKey):
-        self.currentScene = self.scenes[sceneKey]
+        scene = self.__getScene(sceneKey)
+        if self.running:
+            self.__changeScene("set", scene)
+            return
+
+        while self.sceneStack:
+            self.__exitScene(self.sceneStack.pop(), False)
+        self.currentScene = scene
 
     def setWindowSize(self, width, height):
         self.window = pygame.display.set_mode((width, height))
@@ -71,11 +164,84 @@ class Game(object):
     def setTitle(self, title):
         pygame.display.set_caption(title)
 
+    # replaces current scene with sceneKey's scene, does nothing if no scene was added with sceneKey
     def goToScene(self, sceneKey):
         if sceneKey in self.scenes:
-            self.currentScene.stop()
-            self.currentScene = self.scenes[sceneKey]
-            self.currentScene.start()
+            self.replaceScene(sceneKey)
+
+    # ------------------------------- scene stack -------------------------------- #
+
+    """
+        pushScene, popScene, and replaceScene change the scene stack
+        while the game is running the change is applied once the current frame ends
+        sceneKey can be the key a scene was added with or a scene
+        release frees surfaces of the scene leaving the stack, see Scene.release()
+    """
+
+    # pauses current scene and runs sceneKey's scene on top of it
+    def pushScene(self, sceneKey):
+        self.__changeScene("push", self.__getScene(sceneKey))
+
+    # ends current scene and resumes the scene under it, the game stops when no scenes are left
+    def popScene(self, release=False):
+        self.__changeScene("pop", None, release)
+
+    # ends current scene and runs sceneKey's scene in its place
+    def replaceScene(self, sceneKey, release=False):
+        self.__changeScene("replace", self.__getScene(sceneKey), release)
+
+    # returns list of scenes on the scene stack, bottom first
+    def getSceneStack(self):
+        return list(self.sceneStack)
+
+    def __getScene(self, sceneKey):
+        if isinstance(sceneKey, Scene):
+            return sceneKey
+        return self.scenes[sceneKey]
+
+    def __changeScene(self, action, scene, release=False):
+        self.sceneChanges.append((action, scene, release))
+        if not self.running:
+            self.__applySceneChanges()
+
+    def __applySceneChanges(self):
+        changes = self.sceneChanges
+        self.sceneChanges = []
+        for action, scene, release in changes:
+            if action == "push":
+                if self.sceneStack:
+                    self.__exitScene(self.sceneStack[-1], False)
+                self.__enterScene(scene)
+            elif action == "pop":
+                if self.sceneStack:
+                    self.__exitScene(self.sceneStack.pop(), release)
+                if self.sceneStack:
+                    self.sceneStack[-1].keepGoing = False
+                    self.currentScene = self.sceneStack[-1]
+                    self.currentScene.enter__()
+                else:
+                    self.running = False
+            elif action == "replace":
+                if self.sceneStack:
+                    self.__exitScene(self.sceneStack.pop(), release)
+                self.__enterScene(scene)
+            elif action == "set":
+                while self.sceneStack:
+                    self.__exitScene(self.sceneStack.pop(), release)
+                self.__enterScene(scene)
+
+    # puts scene on top of the stack, it sets itself up again on its next frame
+    def __enterScene(self, scene):
+        self.sceneStack.append(scene)
+        self.currentScene = scene
+        scene.keepGoing = False
+        scene.enter__()
+
+    def __exitScene(self, scene, release):
+        scene.stop()
+        scene.exit__()
+        if release:
+            scene.release()
 
 
 class Scene(object):
@@ -87,7 +253,6 @@ class Scene(object):
         self.game = game
         self.map = map
         self.backgroundMap = map.image
-        self.boundsMap = map.boundsMap
         self.numTilesAdded = 0  # number of tiles added to self.tiles[]
         self.mapPos = (0, 0)
         self.surface = game.window
@@ -95,35 +260,197 @@ class Scene(object):
         # ----------------------------- initialize groups ---------------------------- #
         self.sprites = []
         self.groups = []
-        self.tiles = []
+        self.tiles = []  # one sprite for each of the bounds map's merged tile rects
+        self.tileIndex = None  # index in tiles[] of the tile covering each bounds map cell, -1 for empty cells
+        self.tileLayer = None  # every visible tile composited onto one surface, created by buildTiles()
+        self.tiledBackground = None  # backgroundMap with the tile layer on top, what sprites are erased to while tiles show
+        self.tiledBackgroundKey = None  # (backgroundMap, tileLayer) tiledBackground was made from
+        self.collisions = CollisionWorld()  # sprites added with addCollider() are checked against each other every frame
+        self.input = InputDispatcher(self.groups)  # sends mouse events to sprites added with addInteractive()
 
         # ------------------------ initialize other attributes ----------------------- #
         self.framerate = 30
+        self.throttle = True  # wait for the clock to match framerate each frame
         self.clock = pygame.time.Clock()
+        self.mainSprites = None  # group of sprites added with addSprite(), created when the scene is set up
+        self.keepGoing = False
 
-    # ----------------------------- scene management ----------------------------- #
+        # ---------------------------- dirty rect rendering --------------------------- #
+        self.dirtyRectMode = False  # only present changed areas of the screen when True
+        self.dirtyThreshold = .5  # fraction of screen that can be dirty before doing a full flip instead
+        self.dirtyFraction = 1.0  # fraction of screen presented during the last frame
+        self.dirtyRects = []  # rects marked dirty outside of group drawing for the next frame
+        self.fullRedraw = True  # present whole screen next frame
+        self.drawnMapPos = self.mapPos  # map position the background was last blitted at
+        self.tilesDrawnVisible = False  # whether tile layer was visible last frame
+
+        # ---------------------------- fixed timestep mode ---------------------------- #
+        self.stepTime = None  # seconds per simulation step, None updates once per frame instead
+        self.maxSteps = 5  # most simulation steps run in one frame before falling behind
+        self.accumulator = 0  # seconds of real time not simulated yet
+        self.lastFrameTime = None  # time.perf_counter() of the last frame
+        self.interpolation = 1.0  # how far (0 to 1) rendering is between the last two simulation steps
+        self.deltaTime = 0.0  # seconds of game time covered by the current update, used by time based animation
+        self.lastUpdateTime = None  # time.perf_counter() of the last update when updating once per frame
+
+        # ---------------------------------- camera ---------------------------------- #
+        self.camera = None  # Camera scrolling over the world, None draws the map and sprites in window coordinates
+        self.viewBackground = None  # map chunks and tiles under the camera's view, used to draw and erase sprites
+        self.drawnView = None  # camera rect viewBackground was built for
+        self.drawnRects = {}  # group -> screen rects its sprites were drawn at last frame in camera mode
+        self.chunkMargin = 1  # chunks around the view kept loaded, farther chunks are unloaded
+
+        # ------------------------------ sprite activity ------------------------------ #
+        # sprites taken out of their groups are not updated or drawn, and are put back in O(1)
+        self.sleeping = {}  # sprite -> groups it was taken out of while hidden or asleep
+        self.offscreen = {}  # sprite -> groups it was taken out of while off-screen and not simulated
+        self.culling = False  # draw only sprites overlapping the window when there is no camera
+        self.simulateOffscreen = True  # keep updating sprites outside the view, see setCulling()
+        self.cullMargin = 0  # pixels around the view where off-screen sprites are still simulated
+
+        # --------------------------------- profiling --------------------------------- #
+        self.profiler = None  # FrameProfiler timing the main loop, None when profiling is off
+        self.profilerKey = None  # key that toggles the profiler overlay while the scene runs
+        self.profilerOverlayRect = None  # where the profiler overlay was drawn last frame
+
+        # ------------------------------ input recording ------------------------------ #
+        self.recorder = None  # InputRecorder writing every frame's input, None when not recording
+        self.replay = None  # InputReplay feeding recorded input back in, None when playing live
+        self.keys = None  # frame's key state while recording or replaying, read live otherwise
+        self.mousePos = None  # frame's mouse position while recording or replaying
+        self.mouseButtons = None  # frame's mouse buttons while recording or replaying
 
-    # sets up sprite groups, game clock, and main loop
+    # ----------------------------- scene management ----------------------------- #
 
+    # makes this the game's only scene and runs the game's main loop
+    # when the game is already running, this scene replaces the current one once the frame ends instead
     def start(self):
+        if self.game.running:
+            self.game.replaceScene(self)
+        else:
+            self.game.setCurrentScene(self)
+            self.game.start()
+
+    # runs one frame, setting up sprite groups and tiles first if the scene is not running yet
+    def runFrame(self):
+        if not self.keepGoing:
+            self.__setup()
+            self.keepGoing = True
+        self.__mainLoop()
+
+    # abstract method called by the game when this scene becomes the running scene of the scene stack
+    def enter__(self):
+        pass
+
+    # abstract method called by the game when this scene stops being the running scene
+    def exit__(self):
+        pass
+
+    """
+        frees surfaces the scene can rebuild, called by the game when a scene leaves the scene stack with release=True
+        drops the cached tile layer and the rendered surfaces of labels, both are rebuilt when the scene runs again
+    """
+
+    def release(self):
+        self.tileLayer = None
+        self.tiledBackground = None
+        self.dirtyRects = []
+        self.profilerOverlayRect = None
+        for group in self.groups:
+            for sprite in group.sprites():
+                if isinstance(sprite, Label):
+                    sprite.release()
+
+    """
+        runs the scene for numFrames frames without waiting on the clock and returns list of each frame's time in seconds
+        stops early if the scene is stopped
+        used with a headless Game to measure a scene without playing it
+    """
+
+    def runFrames(self, numFrames):
+        # runFrame() only sets up when the scene is not already running, so calling runFrames() again continues the scene
+        self.throttle = False
+        frameTimes = []
+        for i in range(numFrames):
+            start = time.perf_counter()
+            self.runFrame()
+            frameTimes.append(time.perf_counter() - start)
+            if not self.keepGoing:
+                break
+        self.throttle = True
+        return frameTimes
+
+    """
+        advances the scene one frame for simulations and returns the frame's observation from observe__()
+        actions are handed to act__() instead of reading events, then update__() and every group are updated
+        nothing waits on the clock, reads events, draws, or presents, so a headless scene steps as fast as it updates
+        every step lasts the scene's fixed step time, or one frame at its framerate, so runs repeat at any speed
+        see SceneEnv and VectorSceneRunner for resetting scenes and stepping many of them at once
+    """
+
+    def step(self, actions=None):
+        if not self.keepGoing:
+            self.__setup()
+            self.keepGoing = True
+
+        self.act__(actions)
+        if self.offscreen:
+            self.__wakeOffscreen()
+
+        self.deltaTime = self.stepTime if self.stepTime != None else 1.0 / self.framerate
+        self.update__()
+        for group in self.groups:
+            group.update()
+
+        # find colliding sprites once every sprite has moved
+        if self.collisions.sprites:
+            self.collisions.step()
+        return self.observe__()
+
+    # abstract method called by step() with the actions for the next frame
+    def act__(self, actions):
+        pass
+
+    # abstract method returning what step() reports about the scene, the positions of its sprites by default
+    def observe__(self):
+        return [(sprite.x, sprite.y) for sprite in self.sprites]
+
+    # private method: sets up sprite groups and tiles, then draws the first frame
+    def __setup(self):
         # set up sprite groups
-        self.mainSprites = pygame.sprite.OrderedUpdates(self.sprites)
-        self.groups.append(self.mainSprites)
+        if self.mainSprites == None:
+            self.mainSprites = pygame.sprite.OrderedUpdates([sprite for sprite in self.sprites if sprite not in self.sleeping])
+            self.groups.append(self.mainSprites)
+            for sprite in self.sprites:
+                if sprite in self.sleeping:
+                    self.sleeping[sprite].append(self.mainSprites)
+
+        # create tile sprites for collisions once instead of every frame
+        self.buildTiles()
+        self.fullRedraw = True
+        self.__savePositions()
+        self.lastFrameTime = None
+        self.lastUpdateTime = None
+        self.deltaTime = 0.0
+
+        # with a camera the view is drawn from scratch on the first frame
+        if self.camera != None:
+            self.drawnView = None
+            for group in self.groups:
+                group.update()
+            return
 
         # blit map to game's surface at initial position
         self.surface.blit(self.backgroundMap, self.mapPos)
+        self.drawnMapPos = self.mapPos
         self.drawTiles()
+        self.tilesDrawnVisible = self.map.isBoundsMapVisible()
 
         for group in self.groups:
             group.clear(self.surface, self.backgroundMap)
             group.update()
             group.draw(self.surface)
 
-        # start main loop
-        self.keepGoing = True
-        while self.keepGoing:
-            self.__mainLoop()
-
     # stops scene by ending its mainLoop
     def stop(self):
         self.keepGoing = False
@@ -131,33 +458,421 @@ class Scene(object):
     """
         private method: main loop that runs scene
         ticks at set framerate
-        checks pygame events and user's overriden checkEvents__ abstract method
+        checks pygame events and user's overriden checkEvents__ abstract method, events come from the log when replaying
         updates game based on user's overriden update__ abstract method
-        draws all groups
+        draws all groups, then writes the frame's input to the log when recording
     """
 
     def __mainLoop(self):
-        self.clock.tick(self.framerate)
+        if (self.replay != None) and not self.replay.nextFrame():
+            self.__endReplay()
+            return
 
-        # check events
-        for event in pygame.event.get():
+        profiler = self.profiler
+        if profiler != None:
+            profiler.beginFrame()
+
+        if self.throttle:
+            self.clock.tick(self.framerate)
+        else:
+            self.clock.tick()
+        if profiler != None:
+            profiler.mark("clock")
+
+        # check events, taken from the log instead when replaying
+        self.input.beginFrame()
+        if self.replay != None:
+            events = self.replay.events
+            self.keys = self.replay.keys
+            self.mousePos = self.replay.mousePos
+            self.mouseButtons = self.replay.mouseButtons
+        else:
+            events = pygame.event.get()
+            if self.recorder != None:
+                self.keys = pygame.key.get_pressed()
+                self.mousePos = pygame.mouse.get_pos()
+                self.mouseButtons = pygame.mouse.get_pressed()
+        for event in events:
             if event.type == pygame.QUIT:
                 self.keepGoing = False
+                self.game.running = False
+            if (event.type == pygame.KEYDOWN) and (event.key == self.profilerKey):
+                self.toggleProfilerOverlay()
+            self.input.handleEvent(event)
             self.checkEvents__(event)
+        if profiler != None:
+            profiler.mark("events")
+
+        if self.offscreen:
+            self.__wakeOffscreen()
+
+        if self.stepTime == None:
+            now = time.perf_counter()
+            self.deltaTime = (now - self.lastUpdateTime) if self.lastUpdateTime != None else 0.0
+            self.lastUpdateTime = now
+
+            # update scene
+            self.update__()
+            if profiler != None:
+                profiler.mark("update__")
+            self.__draw(True)
+
+            # find colliding sprites once every sprite has moved
+            if self.collisions.sprites:
+                self.collisions.step()
+            steps = 1
+        else:
+            steps = self.__fixedUpdate(self.replay.numSteps if self.replay != None else None)
+            self.__draw(False)
 
-        # update scene
-        self.update__()
+        if self.recorder != None:
+            self.recorder.recordFrame(events, steps, self.keys, self.mousePos, self.mouseButtons)
+
+        if profiler != None:
+            profiler.mark("collisions")
+            profiler.endFrame()
+
+    """
+        private method: runs as many fixed simulation steps as real time has passed since the last frame
+        each step calls update__() and updates every group
+        at most maxSteps steps are run per frame, any time left over past that is dropped so slow frames cannot snowball
+        a replay passes the numSteps recorded for the frame instead, and returns how many steps ran
+    """
+
+    def __fixedUpdate(self, numSteps=None):
+        replayed = numSteps != None
+        if not replayed:
+            now = time.perf_counter()
+            if self.lastFrameTime != None:
+                self.accumulator += now - self.lastFrameTime
+            self.lastFrameTime = now
+
+        steps = 0
+        self.deltaTime = self.stepTime
+        while (steps < numSteps) if replayed else ((self.accumulator >= self.stepTime) and (steps < self.maxSteps)):
+            self.__savePositions()
+
+            # update scene
+            self.update__()
+            if self.profiler != None:
+                self.profiler.mark("update__")
+            for group in self.groups:
+                self.__updateGroup(group)
+            if self.profiler != None:
+                self.profiler.mark("update")
+
+            # find colliding sprites once every sprite has moved
+            if self.collisions.sprites:
+                self.collisions.step()
+            if self.profiler != None:
+                self.profiler.mark("collisions")
+
+            if not replayed:
+                self.accumulator -= self.stepTime
+            steps += 1
+
+        if replayed:
+            self.interpolation = 1.0
+            return steps
+        if self.accumulator >= self.stepTime:
+            self.accumulator = self.accumulator % self.stepTime
+        self.interpolation = self.accumulator / self.stepTime
+        return steps
+
+    # remembers every sprite's position before a simulation step for interpolating between steps
+    def __savePositions(self):
+        for group in self.groups:
+            for sprite in group.sprites():
+                sprite.prevX = sprite.x
+                sprite.prevY = sprite.y
+
+    """
+        private method: draws background, tiles, and every group, then presents the frame
+        updateGroups also updates each group just before it is drawn
+        in fixed timestep mode sprites are drawn between their last two simulation positions instead
+    """
+
+    def __draw(self, updateGroups):
+        if self.camera != None:
+            self.__drawView(updateGroups)
+            return
+        profiler = self.profiler
+
+        # redraw whole background if the map was moved
+        if self.mapPos != self.drawnMapPos:
+            self.surface.blit(self.backgroundMap, self.mapPos)
+            self.drawnMapPos = self.mapPos
+            self.fullRedraw = True
 
         # draw tiles
+        self.__checkTileVisibility()
         self.drawTiles()
+        background = self.__getClearBackground()
+        if profiler != None:
+            profiler.mark("tiles")
+
+        # erase last frame's profiler overlay
+        dirtyRects = self.dirtyRects
+        if self.profilerOverlayRect != None:
+            self.surface.blit(background, self.profilerOverlayRect, self.profilerOverlayRect)
+            dirtyRects.append(self.profilerOverlayRect)
+            self.profilerOverlayRect = None
+
+        # draw sprites, culled groups are erased and drawn by the scene so off-screen sprites are skipped
+        screenRect = self.surface.get_rect()
+        for group in self.groups:
+            culled = self.culling and isinstance(group, pygame.sprite.AbstractGroup)
+            if not culled:
+                group.clear(self.surface, background)
+            if profiler != None:
+                profiler.mark("clear")
+            if updateGroups:
+                self.__updateGroup(group)
+                if profiler != None:
+                    profiler.mark("update")
+            else:
+                self.__interpolate(group)
+            if culled:
+                changed = self.__drawGroupInView(group, screenRect, background)
+            else:
+                changed = group.draw(self.surface)
+            if not updateGroups:
+                for sprite in group.sprites():
+                    sprite.rect.center = (sprite.x, sprite.y)
+            if changed:
+                dirtyRects.extend(changed)
+            if profiler != None:
+                profiler.mark("draw")
+
+        if (profiler != None) and profiler.overlayVisible:
+            self.profilerOverlayRect = profiler.drawOverlay(self.surface)
+            dirtyRects.append(self.profilerOverlayRect)
+
+        self.__present(dirtyRects)
+        self.dirtyRects = []
+        if profiler != None:
+            profiler.mark("present")
+
+    """
+        private method: returns the surface sprites are erased to, the map with the tile layer on top while tiles show
+        erasing to the map alone would cut holes in visible tiles that dirty rect mode never presents again
+        the combined surface is made once and remade only when the map or tile layer changes
+    """
+
+    def __getClearBackground(self):
+        if (self.tileLayer == None) or not self.map.isBoundsMapVisible():
+            return self.backgroundMap
+        if (self.tiledBackground == None) or (self.tiledBackgroundKey != (self.backgroundMap, self.tileLayer)):
+            self.tiledBackground = self.backgroundMap.copy()
+            self.tiledBackground.blit(self.tileLayer, (0, 0))
+            self.tiledBackgroundKey = (self.backgroundMap, self.tileLayer)
+        return self.tiledBackground
+
+    """
+        private method: draws the part of the world under the camera, then presents the frame
+        every group is updated or interpolated first so the camera can follow sprites to where they are drawn
+        the map chunks and tiles under the view are only redrawn when the camera moves
+        sprites keep world coordinates and only sprites overlapping the view are drawn
+    """
 
-        # draw sprites
+    def __drawView(self, updateGroups):
+        profiler = self.profiler
+        camera = self.camera
         for group in self.groups:
-            group.clear(self.surface, self.backgroundMap)
+            if updateGroups:
+                self.__updateGroup(group)
+            else:
+                self.__interpolate(group)
+        if profiler != None:
+            profiler.mark("update")
+
+        camera.update()
+        view = camera.getRect()
+        tilesVisible = self.map.isBoundsMapVisible()
+        if (view != self.drawnView) or (tilesVisible != self.tilesDrawnVisible):
+            self.__buildView(view, tilesVisible)
+            self.surface.blit(self.viewBackground, (0, 0))
+            self.fullRedraw = True
+            self.drawnRects = {}
+            self.profilerOverlayRect = None
+        if profiler != None:
+            profiler.mark("tiles")
+
+        # erase last frame's profiler overlay
+        dirtyRects = self.dirtyRects
+        if self.profilerOverlayRect != None:
+            self.surface.blit(self.viewBackground, self.profilerOverlayRect, self.profilerOverlayRect)
+            dirtyRects.append(self.profilerOverlayRect)
+            self.profilerOverlayRect = None
+
+        for group in self.groups:
+            if isinstance(group, pygame.sprite.AbstractGroup):
+                changed = self.__drawGroupInView(group, view, self.viewBackground)
+                if not updateGroups:
+                    for sprite in group.sprites():
+                        sprite.rect.center = (sprite.x, sprite.y)
+            else:
+                # groups that are not pygame groups, like SpriteBatch, draw themselves offset by the camera
+                group.clear(self.surface, self.viewBackground)
+                changed = group.draw(self.surface, (-view.x, -view.y))
+            if changed:
+                dirtyRects.extend(changed)
+            if profiler != None:
+                profiler.mark("draw")
+
+        if (profiler != None) and profiler.overlayVisible:
+            self.profilerOverlayRect = profiler.drawOverlay(self.surface)
+            dirtyRects.append(self.profilerOverlayRect)
+
+        self.__present(dirtyRects)
+        self.dirtyRects = []
+        if profiler != None:
+            profiler.mark("present")
+
+    # draws map chunks and visible tiles under view onto viewBackground, unloading chunks far from the view
+    def __buildView(self, view, tilesVisible):
+        if (self.viewBackground == None) or (self.viewBackground.get_size() != view.size):
+            self.viewBackground = pygame.Surface(view.size).convert()
+        background = self.viewBackground
+        background.fill((0, 0, 0))
+
+        chunkSize = self.map.chunkSize
+        chunks = []
+        for chunkY in range(view.top // chunkSize, ((view.bottom - 1) // chunkSize) + 1):
+            for chunkX in range(view.left // chunkSize, ((view.right - 1) // chunkSize) + 1):
+                chunk = self.map.getChunk(chunkX, chunkY)
+                if chunk != None:
+                    chunks.append((chunk, ((chunkX * chunkSize) - view.x, (chunkY * chunkSize) - view.y)))
+        background.blits(chunks, False)
+        margin = self.chunkMargin * chunkSize
+        self.map.unloadChunksOutside(view.inflate(2 * margin, 2 * margin))
+
+        # only the bounds map cells under the view are drawn
+        tileW = self.map.tileW
+        tileH = self.map.tileH
+        if tilesVisible and self.tiles and (tileW > 0) and (tileH > 0):
+            background.blits(self.__tileBlits(max(view.top // tileH, 0), ((view.bottom - 1) // tileH) + 1,
+                                              max(view.left // tileW, 0), ((view.right - 1) // tileW) + 1,
+                                              -view.x, -view.y), False)
+
+        self.drawnView = view
+        self.tilesDrawnVisible = tilesVisible
+
+    """
+        private method: erases group's sprites from last frame and draws the ones overlapping view
+        view is in world coordinates, background is what the screen shows under the sprites
+        when off-screen sprites are not simulated, sprites farther than cullMargin outside the view leave their groups
+        returns the screen areas changed
+    """
+
+    def __drawGroupInView(self, group, view, background):
+        erased = self.drawnRects.get(group, [])
+        if erased:
+            self.surface.blits([(background, rect, rect) for rect in erased], False)
+
+        screenRect = self.surface.get_rect()
+        images = []
+        drawn = []
+        culled = []
+        for sprite in group.sprites():
+            rect = sprite.rect if sprite.screenSpace else sprite.rect.move(-view.x, -view.y)
+            if rect.colliderect(screenRect):
+                images.append((sprite.image, rect))
+                drawn.append(rect)
+            elif not sprite.screenSpace:
+                culled.append(sprite)
+        self.surface.blits(images, False)
+        self.drawnRects[group] = drawn
+        # sprites that left the group are erased through drawnRects, so pygame's own list of them is dropped
+        group.lostsprites = []
+
+        if culled and not self.simulateOffscreen:
+            area = view.inflate(2 * self.cullMargin, 2 * self.cullMargin)
+            for sprite in culled:
+                if not sprite.rect.colliderect(area):
+                    self.__takeOutOfGroups(sprite, self.offscreen)
+        return erased + drawn
+
+    # puts off-screen sprites that are back within cullMargin of the view into their groups again
+    def __wakeOffscreen(self):
+        view = self.camera.getRect() if self.camera != None else self.surface.get_rect()
+        area = view.inflate(2 * self.cullMargin, 2 * self.cullMargin)
+        for sprite in [sprite for sprite in self.offscreen if sprite.rect.colliderect(area)]:
+            sprite.add(*self.offscreen.pop(sprite))
+
+    # removes sprite from every group it is in, remembering them in store so it can be put back
+    def __takeOutOfGroups(self, sprite, store):
+        groups = sprite.groups()
+        sprite.remove(*groups)
+        store[sprite] = groups
+
+    # updates group, timing each sprite class's update when profiling
+    def __updateGroup(self, group):
+        if self.profiler == None:
             group.update()
-            group.draw(self.surface)
+        else:
+            self.profiler.updateGroup(group)
+
+    # moves group's sprite rects between their previous and current positions
+    # sprites that jumped more than half the screen, like wrapping or hiding, are drawn where they are now
+    def __interpolate(self, group):
+        alpha = self.interpolation
+        maxJumpX = .5 * self.surface.get_width()
+        maxJumpY = .5 * self.surface.get_height()
+        for sprite in group.sprites():
+            dx = sprite.x - sprite.prevX
+            dy = sprite.y - sprite.prevY
+            if (abs(dx) > maxJumpX) or (abs(dy) > maxJumpY):
+                sprite.rect.center = (sprite.x, sprite.y)
+            else:
+                sprite.rect.center = (sprite.prevX + (dx * alpha), sprite.prevY + (dy * alpha))
+
+    # marks the tile layer dirty when tiles are shown or hidden, erasing the tiles when they are hidden
+    def __checkTileVisibility(self):
+        tilesVisible = self.map.isBoundsMapVisible()
+        if (tilesVisible == self.tilesDrawnVisible) or (self.tileLayer == None):
+            self.tilesDrawnVisible = tilesVisible
+            return
+
+        layerRect = self.tileLayer.get_rect()
+        if not tilesVisible:
+            self.surface.blit(self.backgroundMap, layerRect.topleft,
+                              layerRect.move(-self.mapPos[0], -self.mapPos[1]))
+        self.dirtyRects.append(layerRect)
+        self.tilesDrawnVisible = tilesVisible
+
+    """
+        private method: shows this frame's drawing on the display
+        flips the whole display unless dirty rect mode is on
+        in dirty rect mode only the merged dirty rects are updated, unless they cover more than dirtyThreshold of the screen
+    """
+
+    def __present(self, dirtyRects):
+        if not self.dirtyRectMode:
+            self.dirtyFraction = 1.0
+            self.fullRedraw = False
+            pygame.display.flip()
+            return
+
+        screenRect = self.surface.get_rect()
+        screenArea = screenRect.width * screenRect.height
+        rects = []
+        full = self.fullRedraw or (screenArea <= 0)
+        if not full:
+            rects = mergeRects(dirtyRects, screenRect)
+            dirtyArea = 0
+            for rect in rects:
+                dirtyArea += rect.width * rect.height
+            self.dirtyFraction = dirtyArea / screenArea
+        else:
+            self.dirtyFraction = 1.0
 
-        pygame.display.flip()
+        # a full redraw is flipped even when the threshold is 1, which no fraction is above
+        if full or (self.dirtyFraction > self.dirtyThreshold):
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        self.fullRedraw = False
 
     def checkEvents__(self, event):
         pass
@@ -168,48 +883,309 @@ class Scene(object):
     def setFramerate(self, framerate):
         self.framerate = framerate
 
+    """
+        runs update__() and sprite motion at a fixed rate of simulationRate steps per second, separate from the framerate
+        sprites are drawn between their last two simulation positions so motion stays smooth at any framerate
+        maxSteps is the most steps run in one frame, real time past that is dropped instead of catching up
+        simulationRate 0, the default, steps at the scene's framerate, so speeds set per frame keep the same pace
+        a simulationRate of None goes back to updating once per frame
+    """
+
+    def setFixedTimestep(self, simulationRate=0, maxSteps=5):
+        if simulationRate == None:
+            self.stepTime = None
+        elif simulationRate == 0:
+            self.stepTime = 1 / self.framerate
+        else:
+            self.stepTime = 1 / simulationRate
+        self.maxSteps = maxSteps
+        self.accumulator = 0
+        self.lastFrameTime = None
+        self.__savePositions()
+
+    """
+        starts timing each phase of the main loop and each sprite class's update, see FrameProfiler
+        can be called while the scene is running, keeps the existing profiler if profiling is already on
+        capacity is how many frames of timings are kept
+    """
+
+    def enableProfiler(self, capacity=600):
+        if self.profiler == None:
+            self.profiler = FrameProfiler(capacity)
+        return self.profiler
+
+    # stops profiling, leaving the main loop with no timing overhead
+    def disableProfiler(self):
+        self.profiler = None
+
+    # returns the scene's FrameProfiler, or None if profiling is off
+    def getProfiler(self):
+        return self.profiler
+
+    # shows or hides the profiler's on-screen overlay, turning profiling on if it is off
+    def toggleProfilerOverlay(self):
+        self.enableProfiler().toggleOverlay()
+
+    # sets a key such as pygame.K_F3 that toggles the profiler overlay while the scene runs, None turns the key off
+    def setProfilerKey(self, key):
+        self.profilerKey = key
+
+    # returns seconds of game time the current update covers, the time since the last frame or the fixed step time
+    def getDeltaTime(self):
+        return self.deltaTime
+
+    # returns how far (0 to 1) the last frame was drawn between the last two simulation steps
+    def getInterpolation(self):
+        return self.interpolation
+
+    """
+        draws the scene through a Camera, letting the map and sprites cover a world larger than the window
+        sprites keep world coordinates and are bounded by the world instead of the window
+        the map is drawn in chunks, see Map.createChunk__(), and only chunks near the view stay loaded
+        camera defaults to a window sized Camera over the map's world size, the camera is returned
+    """
+
+    def setCamera(self, camera=None):
+        if camera == None:
+            worldWidth, worldHeight = self.map.getWorldSize()
+            camera = Camera(self.surface.get_width(), self.surface.get_height(), worldWidth, worldHeight)
+        self.camera = camera
+        self.input.camera = camera
+        self.drawnView = None
+        self.drawnRects = {}
+        self.fullRedraw = True
+        return camera
+
+    # goes back to drawing the map and sprites in window coordinates
+    def removeCamera(self):
+        self.camera = None
+        self.input.camera = None
+        self.viewBackground = None
+        self.drawnView = None
+        self.drawnRects = {}
+        self.map.unloadChunksOutside(pygame.Rect(0, 0, 0, 0))
+        self.fullRedraw = True
+        self.drawnMapPos = None
+
+    def getCamera(self):
+        return self.camera
+
+    # sets how many chunks around the view stay loaded, higher margins reload less when the camera turns back
+    def setChunkMargin(self, chunkMargin):
+        self.chunkMargin = chunkMargin
+
+    # returns (width, height) sprites are bounded by, the camera's world or the window when there is no camera
+    # a camera without a world size returns None for each side it does not limit, and sprites are not bounded there
+    def getWorldSize(self):
+        if self.camera == None:
+            return self.surface.get_size()
+        return (self.camera.worldWidth, self.camera.worldHeight)
+
+    # ------------------------------ sprite activity ------------------------------ #
+
+    """
+        takes sprite out of its groups so it is not updated, drawn, or tested for collisions with those groups
+        called by Sprite.hide() and Sprite.sleep(), the groups are remembered so wakeSprite() can put it back
+    """
+
+    def sleepSprite(self, sprite):
+        if sprite in self.sleeping:
+            return
+        if sprite in self.offscreen:
+            self.sleeping[sprite] = self.offscreen.pop(sprite)
+        else:
+            self.__takeOutOfGroups(sprite, self.sleeping)
+
+    # puts a sleeping sprite back into the groups it was in, sprites in ordered groups are drawn on top of the others
+    def wakeSprite(self, sprite):
+        groups = self.sleeping.pop(sprite, None)
+        if groups != None:
+            sprite.add(*groups)
+
+    """
+        culling draws only the sprites overlapping the window, sprites outside a camera's view are always culled
+        simulateOffscreen False also stops updating sprites more than margin pixels outside the view
+        until the view comes back to them, for worlds full of sprites that only need to move when seen
+    """
+
+    def setCulling(self, culling=True, simulateOffscreen=True, margin=0):
+        self.culling = culling
+        self.simulateOffscreen = simulateOffscreen
+        self.cullMargin = margin
+        self.drawnRects = {}
+        self.drawnMapPos = None
+        self.drawnView = None
+        if simulateOffscreen:
+            for sprite, groups in self.offscreen.items():
+                sprite.add(*groups)
+            self.offscreen = {}
+
+    # returns how many sprites are in the scene's groups, sleeping, and off-screen without being simulated
+    def getSpriteCounts(self):
+        active = set()
+        for group in self.groups:
+            if isinstance(group, pygame.sprite.AbstractGroup):
+                active.update(group.sprites())
+        return {"active": len(active), "sleeping": len(self.sleeping), "offscreen": len(self.offscreen)}
+
+    """
+        turns dirty rect rendering on or off
+        when on, only the parts of the screen that changed are sent to the display each frame
+        if the changed area is more than threshold (0 to 1) of the screen, the whole display is flipped instead
+        anything blitted straight to the scene's surface must be passed to markDirty() to be shown
+    """
+
+    def setDirtyRectMode(self, enabled=True, threshold=.5):
+        self.dirtyRectMode = enabled
+        self.dirtyThreshold = threshold
+        self.fullRedraw = True
+
+    # marks rect as changed for the next frame, marks the whole screen if rect is None
+    def markDirty(self, rect=None):
+        if rect == None:
+            self.fullRedraw = True
+        else:
+            self.dirtyRects.append(pygame.Rect(rect))
+
+    # returns fraction (0 to 1) of the screen presented during the last frame
+    def getDirtyFraction(self):
+        return self.dirtyFraction
+
     # ----------------------------- group management ----------------------------- #
 
+    """
+        creates the tile sprites used for checking collisions and the cached tile layer used for drawing tiles
+        tile sprites are only created once per scene, the tile layer is rebuilt from the bounds map if release() dropped it
+        there is one tile sprite for each of the map's merged tile rects, added to tiles[] in row by row order
+        tileLayer is every tile pre-blitted onto one transparent surface so visible tiles can be drawn with a single blit
+    """
+
+    def buildTiles(self):
+        if self.tileLayer != None:
+            return
+        if self.tileIndex == None:
+            self.__buildTileSprites()
+        if self.camera != None:
+            # with a camera, tiles are drawn straight from the bounds map, so a world sized tile layer is never made
+            return
+
+        # composite every tile onto one surface that is blitted whenever tiles are visible
+        # empty cells are a run-length encoded colorkey so blitting skips them cheaply
+        tiles = self.__tileBlits(0, self.map.numRows, 0, self.map.numCols, 0, 0)
+        layerW = 0
+        layerH = 0
+        for tile, (left, top) in tiles:
+            layerW = max(layerW, left + tile.get_width())
+            layerH = max(layerH, top + tile.get_height())
+        self.tileLayer = pygame.Surface((layerW, layerH))
+        self.tileLayer.fill(TILE_LAYER_COLORKEY)
+        self.tileLayer.blits(tiles, False)
+        self.tileLayer.set_colorkey(TILE_LAYER_COLORKEY, pygame.RLEACCEL)
+
+    # creates a sprite for each merged tile rect and indexes which tile covers each bounds map cell
+    def __buildTileSprites(self):
+        tileW = self.map.tileW
+        tileH = self.map.tileH
+        numCols = self.map.numCols
+        self.tileIndex = array("i", [-1]) * (self.map.numRows * numCols)
+        for cellRect in self.map.tileRects:
+            rect = pygame.Rect(cellRect.left * tileW, cellRect.top * tileH, cellRect.width * tileW, cellRect.height * tileH)
+            sprite = Sprite(self)
+            sprite.image = self.map.tileSurface
+            sprite.x = rect.left + (.5 * rect.width)
+            sprite.y = rect.bottom
+            sprite.rect = rect
+            sprite.displayedImgWidth = rect.width
+            sprite.displayedImgHeight = rect.height
+            sprite.displayedImageCenter = rect.center
+
+            covered = array("i", [len(self.tiles)]) * cellRect.width
+            for r in range(cellRect.top, cellRect.bottom):
+                start = (r * numCols) + cellRect.left
+                self.tileIndex[start:start + cellRect.width] = covered
+            self.tiles.append(sprite)
+            self.numTilesAdded += 1
+
+    # returns (tile surface, position) of every boundary cell in the given rows and columns, offset by offsetX and offsetY
+    def __tileBlits(self, firstRow, endRow, firstCol, endCol, offsetX, offsetY):
+        tileW = self.map.tileW
+        tileH = self.map.tileH
+        numCols = self.map.numCols
+        cells = self.map.cells
+        tile = self.map.tileSurface
+        endRow = min(endRow, self.map.numRows)
+        endCol = min(endCol, numCols)
+        blits = []
+        for r in range(firstRow, endRow):
+            rowStart = r * numCols
+            c = cells.find(1, rowStart + firstCol, rowStart + endCol)
+            while c != -1:
+                blits.append((tile, (((c - rowStart) * tileW) + offsetX, (r * tileH) + offsetY)))
+                c = cells.find(1, c + 1, rowStart + endCol)
+        return blits
+
+    # blits bounds map tiles if they are set to visible
+    # builds tiles[] for checking collisions the first time it is called
+    # used for debugging bounds collisions
     def drawTiles(self):
-        # blits bounds map tiles if they are set to visible
-        # also adds tile rectangles to tiles[] for checking collisions
-        # used for debugging bounds collisions
+        self.buildTiles()
+        if (self.map.isBoundsMapVisible()) and (self.camera == None):
+            self.surface.blit(self.tileLayer, (0, 0))
+
+    """
+        returns tiles whose bounds map cells overlap the area between left, top, right, and bottom
+        edges touching a cell count as overlapping, same as Sprite.tileCollision()
+        tiles are returned in the same row by row order they were added to tiles[]
+        only the grid cells under the area are looked at, so cost depends on the area's size instead of the number of tiles
+    """
+
+    def getTilesNear(self, left, top, right, bottom):
         tileW = self.map.tileW
         tileH = self.map.tileH
-        tileY = 0
-        r = 0
-        for row in self.boundsMap:
-            tileX = 0
-            c = 0
-            for col in row:
-                currentTile = col
-                if (currentTile != 0):
-                    tile = self.boundsMap[r][c]
-                    sprite = Sprite(self)
-                    sprite.image = tile
-                    #tileRect = sprite.get_rect()
-                    #tileRect.x = tileX
-                    #tileRect.y = tileY
-                    sprite.x = tileX + (.5 * tile.get_width())
-                    sprite.y = tileY + (tile.get_height())
-                    sprite.rect = tile.get_rect(center=(sprite.x, sprite.y))
-                    sprite.displayedImgWidth = tile.get_width()
-                    sprite.displayedImgHeight = tile.get_height()
-                    sprite.displayedImageCenter = tile.get_rect().center
-
-                    if (self.numTilesAdded < self.map.numTiles):
-                        self.tiles.append(sprite)
-                        self.numTilesAdded += 1
-
-                    if (self.map.isBoundsMapVisible()):
-                        self.surface.blit(tile, (tileX, tileY))
-                c += 1
-                tileX += tileW
-            r += 1
-            tileY += tileH
+        if (not self.tiles) or (tileW <= 0) or (tileH <= 0):
+            return []
+
+        # a cell in column c spans c * tileW to (c + 1) * tileW, rows work the same way
+        numCols = self.map.numCols
+        firstCol = max(math.ceil(left / tileW) - 1, 0)
+        lastCol = min(math.floor(right / tileW), numCols - 1)
+        firstRow = max(math.ceil(top / tileH) - 1, 0)
+        lastRow = min(math.floor(bottom / tileH), self.map.numRows - 1)
+        if (firstCol > lastCol) or (firstRow > lastRow):
+            return []
+
+        # a merged tile covers many cells, so each tile is only returned once
+        found = set()
+        for r in range(firstRow, lastRow + 1):
+            start = r * numCols
+            found.update(self.tileIndex[start + firstCol:start + lastCol + 1])
+        found.discard(-1)
+        return [self.tiles[i] for i in sorted(found)]
+
+    """
+        sweeps the box between left, top, right, and bottom along dx, dy and returns the first tile it touches
+        returns (time, normalX, normalY, tile) where time (0 to 1) is how far along the motion the box touches tile,
+        and the normal points out of the side of tile that was hit, or None if the box reaches dx, dy freely
+        only the tiles under the area the box moves through are tested
+    """
+
+    def sweepTiles(self, left, top, right, bottom, dx, dy):
+        nearbyTiles = self.getTilesNear(min(left, left + dx), min(top, top + dy),
+                                        max(right, right + dx), max(bottom, bottom + dy))
+        first = None
+        for tile in nearbyTiles:
+            hit = sweepRect(left, top, right, bottom, dx, dy, tile.rect)
+            if (hit != None) and ((first == None) or (hit[0] < first[0])):
+                first = (hit[0], hit[1], hit[2], tile)
+        return first
 
     def addSprite(self, sprite):
         self.sprites.append(sprite)
+        if self.mainSprites != None:
+            if sprite in self.sleeping:
+                self.sleeping[sprite].append(self.mainSprites)
+            else:
+                self.mainSprites.add(sprite)
 
     # creates a sprite group whose clear, update, and draw methods will be automatically handled once added to groups
     def createSpriteGroup(self, sprites):
@@ -219,6 +1195,29 @@ class Scene(object):
     def addGroup(self, group):
         self.groups.append(group)
 
+    # adds a SpriteBatch to be cleared, updated, and drawn each iteration of the loop like a group
+    def addBatch(self, batch):
+        self.groups.append(batch)
+
+    # adds a sprite to the scene's collision world so its collisions are found every frame
+    # see CollisionWorld for the enter, stay, and exit callbacks
+    def addCollider(self, sprite):
+        self.collisions.add(sprite)
+
+    def removeCollider(self, sprite):
+        self.collisions.remove(sprite)
+
+    # returns list of (sprite, sprite) pairs that were overlapping at the end of the last frame
+    def getCollisionPairs(self):
+        return self.collisions.pairs
+
+    # sprite starts getting mouse press, click, and hover callbacks from the scene's input dispatcher
+    def addInteractive(self, sprite):
+        self.input.add(sprite)
+
+    def removeInteractive(self, sprite):
+        self.input.remove(sprite)
+
     # ------------------------------ map management ------------------------------ #
 
     def setBackgroundMap(self, map):
@@ -227,6 +1226,11 @@ class Scene(object):
     def setMapPos(self, x, y):
         self.mapPos = (x, y)
 
+    # read-only bounds map grid of the scene's map, kept for older code, see Map.boundsMap
+    @property
+    def boundsMap(self):
+        return self.map.boundsMap
+
     # --------------------------------- controls --------------------------------- #
 
     def hideCursor(self):
@@ -238,11 +1242,123 @@ class Scene(object):
     def isMouseVisible(self):
         return pygame.mouse.get_visible()
 
+    # mouse and key state are read from the log while replaying, and as recorded while recording
     def getMousePos(self):
+        if self.mousePos != None:
+            return self.mousePos
         return pygame.mouse.get_pos()
 
+    # returns whether each mouse button is held, like pygame.mouse.get_pressed()
+    def getMouseButtons(self):
+        if self.mouseButtons != None:
+            return self.mouseButtons
+        return pygame.mouse.get_pressed()
+
+    # returns the key state, indexed by keys like pygame.K_SPACE, use this instead of pygame.key.get_pressed() so replays work
+    def getKeys(self):
+        if self.keys != None:
+            return self.keys
+        return pygame.key.get_pressed()
+
+    # ------------------------------ input recording ------------------------------ #
+
+    """
+        starts writing every frame's events, key state, mouse state, and simulation steps to filename, see InputRecorder
+        random is seeded with seed, a random one by default, and the seed is saved so a replay draws the same numbers
+        scenes without a fixed timestep are switched to one at their framerate, so replays update in the same steps
+        start recording before the scene's first frame so a replay of a new scene ends in the same state
+    """
+
+    def startRecording(self, filename, seed=None):
+        self.stopRecording()
+        if seed == None:
+            seed = random.randrange(2 ** 63)
+        if self.stepTime == None:
+            self.setFixedTimestep(0, self.maxSteps)
+        random.seed(seed)
+        self.recorder = InputRecorder(filename, seed, self.stepTime)
+
+    # stops recording, saving the scene's state from observe__() so replays can check they end the same
+    def stopRecording(self):
+        if self.recorder != None:
+            self.recorder.close(repr(self.observe__()))
+            self.recorder = None
+            self.keys = None
+            self.mousePos = None
+            self.mouseButtons = None
+
+    def isRecording(self):
+        return self.recorder != None
+
+    """
+        feeds the input recorded in filename back through the main loop instead of reading events and devices
+        random is seeded and the timestep set as they were recorded, and each frame runs the simulation steps it recorded
+        the scene stops once every frame is replayed, then the returned InputReplay tells whether it ended as recorded
+    """
+
+    def startReplay(self, filename):
+        self.replay = InputReplay(filename)
+        self.setFixedTimestep(1 / self.replay.stepTime, self.maxSteps)
+        self.stepTime = self.replay.stepTime  # exactly the recorded step, 1 / (1 / step) can round differently
+        random.seed(self.replay.seed)
+        return self.replay
+
+    # replays filename as fast as possible without waiting on the clock and returns the finished InputReplay
+    def runReplay(self, filename):
+        replay = self.startReplay(filename)
+        self.throttle = False
+        while self.replay != None:
+            self.runFrame()
+            # the scene stopped itself, such as on a recorded QUIT event, before the log ran out
+            if (not self.keepGoing) and (self.replay != None):
+                self.__endReplay()
+        self.throttle = True
+        return replay
+
+    def isReplaying(self):
+        return self.replay != None
+
+    # private method: stops the scene once the replay runs out of frames, recording the state it ended in
+    def __endReplay(self):
+        self.replay.finish(repr(self.observe__()))
+        self.replay = None
+        self.keys = None
+        self.mousePos = None
+        self.mouseButtons = None
+        self.keepGoing = False
+
 
 class Sprite(pygame.sprite.Sprite):
+    """
+        attributes are kept in slots instead of a per-sprite dictionary, so large populations of sprites stay small
+        subclasses without their own __slots__ can still add any attributes they need
+    """
+
+    __slots__ = (
+        "scene",
+        "x", "y", "prevX", "prevY", "dx", "dy", "acceleration", "speed", "maxSpeed", "minSpeed", "imgAngle", "moveAngle",
+        "boundAction", "collidable", "collisionLayer", "collisionMask", "pixelPerfect", "sweptCollisions", "tileHit",
+        "tileHitPending", "pressed",
+        "font", "imageMaster", "image", "baseImage", "imgScale", "rect",
+        "imgWidth", "imgHeight", "imgCenter", "displayedImgWidth", "displayedImgHeight", "displayedImageCenter",
+        "croppedLeft", "croppedTop", "croppedWidth", "croppedHeight",
+        "animate", "animationSpeed", "animationTickSpeed", "animationFps", "animationPosition",
+        "currentAnimationFrame", "currentAnimation", "animations",
+        "visible", "awake", "screenSpace", "hiddenX", "hiddenY",
+    )
+
+    # ----------------------------- create constants ----------------------------- #
+    # bounds constants
+    WRAP = WRAP
+    BOUNCE = BOUNCE
+    STOP = STOP
+    HIDE = HIDE
+    CONTINUE = CONTINUE
+
+    # placeholder font, image, and animations every sprite starts with, created when the first sprite is
+    placeholderFont = None
+    placeholderImage = None
+    defaultAnimations = None  # shared until a sprite adds an animation of its own
 
     # ----------------------------- sprite management ---------------------------- #
 
@@ -251,18 +1367,12 @@ class Sprite(pygame.sprite.Sprite):
         pygame.sprite.Sprite.__init__(self)
         self.scene = scene
 
-        # ----------------------------- create constants ----------------------------- #
-        # bounds constants
-        self.WRAP = 0
-        self.BOUNCE = 1
-        self.STOP = 2
-        self.HIDE = 3
-        self.CONTINUE = 4
-
         # -------------------------- init sprite attributes -------------------------- #
         # motion and position attributes
         self.x = 200
         self.y = 200
+        self.prevX = 200  # position before the last fixed timestep simulation step
+        self.prevY = 200
         self.dx = 0
         self.dy = 0
         self.acceleration = 0
@@ -273,24 +1383,34 @@ class Sprite(pygame.sprite.Sprite):
         self.moveAngle = 0
 
         # event attributes
-        self.boundAction = self.WRAP
+        self.boundAction = WRAP
         self.collidable = True
+        self.collisionLayer = 1  # bits of the layers this sprite is on
+        self.collisionMask = ALL_LAYERS  # bits of the layers this sprite collides with
+        self.pixelPerfect = False  # collide by opaque pixels instead of the whole rect
+        self.sweptCollisions = False  # sweep each frame's motion against tiles instead of testing speed-expanded edges
+        self.tileHit = None  # (time, normalX, normalY, tile) of the tile the last swept move stopped at, or None
+        self.tileHitPending = False  # tileHit is from this update's sweep and has not been resolved by checkBounds() yet
         self.pressed = False
 
         """
             default placeholders for sprite appearance attributes
             font used for placeholder image and ui extended from sprite
             image is actual sprite image
+            baseImage is image before rotation and scaling: imageMaster, a crop or scale of it, or the current animation cell
             displayedImage is what is displayed to player after rotation and position updates
             rect is image's rectangle
             imageCenter is original image's center
             displayedImageCenter is center of image displayed to player
             visible draws sprite if True
         """
-        self.font = pygame.font.Font("freesansbold.ttf", 30)
-        self.imageMaster = self.font.render(
-            "DVD", True, (0, 0, 0), (0xFF, 0xFF, 0xFF))
+        if Sprite.placeholderImage == None:
+            Sprite.__createPlaceholder()
+        self.font = Sprite.placeholderFont
+        self.imageMaster = Sprite.placeholderImage
         self.image = self.imageMaster
+        self.baseImage = self.imageMaster
+        self.imgScale = 1
         self.rect = self.imageMaster.get_rect()
 
         # imageMaster dimensions
@@ -306,25 +1426,36 @@ class Sprite(pygame.sprite.Sprite):
         # cropped image dimensions
         self.croppedLeft = 0
         self.croppedTop = 0
-        self.croppedWidth = self.rect.width
-        self.croppedHeight = self.rect.height
+        self.croppedWidth = self.imgWidth
+        self.croppedHeight = self.imgHeight
 
-        # animation
+        # animation, clips are shared between sprites and each sprite only keeps its own playhead
         self.animate = False
         self.animationSpeed = 1
-        self.animationTickCounter = 0
         self.animationTickSpeed = 1
+        self.animationFps = None  # cells per second, None plays at the current clip's frame rate
+        self.animationPosition = 0.0  # playhead in cells since the current animation started
         self.currentAnimationFrame = 0
         self.currentAnimation = "default"
-        self.animations = {
-            "default": [self.image]
-        }
+        self.animations = Sprite.defaultAnimations  # copied the first time this sprite adds an animation
 
         self.visible = True
+        self.awake = True  # False while put to sleep with sleep()
+        self.screenSpace = False  # with a camera, True draws the sprite at its window position, like a HUD
         # remembers x and y from before they were hidden
         self.hiddenX = 200
         self.hiddenY = 200
 
+    # creates the placeholder font, image, and default animation shared by every sprite
+    @staticmethod
+    def __createPlaceholder():
+        Sprite.placeholderFont = resources.getFont("freesansbold.ttf", 30)
+        Sprite.placeholderImage = resources.getText(
+            "DVD", "freesansbold.ttf", 30, (0, 0, 0), (0xFF, 0xFF, 0xFF))
+        Sprite.defaultAnimations = {
+            "default": AnimationClip([Sprite.placeholderImage])
+        }
+
     # abstract method for users to add events to actors extended from sprite class
     def checkEvents__(self):
         pass
@@ -335,8 +1466,8 @@ class Sprite(pygame.sprite.Sprite):
 
         self.__animate()
 
-        # rotate displayedImage
-        self.image = pygame.transform.rotate(self.image, self.imgAngle)
+        # rotate and scale baseImage, transformed images are cached and shared between frames and sprites
+        self.image = transforms.get(self.baseImage, self.imgAngle, self.imgScale)
         self.rect = self.image.get_rect(center=self.rect.center)
         self.displayedImgWidth = self.rect.width
         self.displayedImgHeight = self.rect.height
@@ -349,8 +1480,11 @@ class Sprite(pygame.sprite.Sprite):
         self.dy *= -1
 
         # caluculate position
-        self.x += self.dx
-        self.y += self.dy
+        if self.sweptCollisions:
+            self.__sweep()
+        else:
+            self.x += self.dx
+            self.y += self.dy
 
         self.checkBounds()
 
@@ -363,9 +1497,13 @@ class Sprite(pygame.sprite.Sprite):
 
     # ---------------------- image management and visibility --------------------- #
 
+    # images are loaded through the shared resource cache, so sprites using the same file share one surface
     def setImage(self, image):
-        self.imageMaster = pygame.image.load(image)
-        self.imageMaster = self.imageMaster.convert_alpha()
+        self.setImageSurface(resources.getImage(image))
+
+    # sets an already loaded surface as the sprite's image, such as a region from a TextureAtlas
+    def setImageSurface(self, surface):
+        self.imageMaster = surface
         self.rect = self.imageMaster.get_rect()
 
         # imageMaster dimensions
@@ -385,9 +1523,11 @@ class Sprite(pygame.sprite.Sprite):
         self.croppedHeight = self.rect.height
 
         self.image = self.imageMaster
+        self.baseImage = self.imageMaster
 
     def setDisplayedImageAsMaster(self):
         self.imageMaster = self.image
+        self.baseImage = self.image
 
     """
         sets self.image to a cropped sprite image based off imageMaster
@@ -413,6 +1553,7 @@ class Sprite(pygame.sprite.Sprite):
 
         self.image = self.imageMaster.subsurface(
             (self.croppedLeft, self.croppedTop, self.croppedWidth, self.croppedHeight))
+        self.baseImage = self.image
         self.rect = self.image.get_rect(center=self.rect.center)
 
     def cropReset(self):
@@ -424,49 +1565,85 @@ class Sprite(pygame.sprite.Sprite):
     # wrapper for pygame.transform.scale
     # only scales displayed image, not imageMaster or any of current animations set
     def scale(self, width, height):
-        self.image = pygame.transform.scale(self.image, (width, height))
+        self.baseImage = pygame.transform.scale(self.baseImage, (width, height))
+        self.image = self.baseImage
 
     # wrapper for pygame.transform.scale_by
     # only scales displayed image, not imageMaster or any of current animations set
     def scaleBy(self, scalar):
-        self.image = pygame.transform.scale_by(self.image, scalar)
+        self.baseImage = pygame.transform.scale_by(self.baseImage, scalar)
+        self.image = self.baseImage
+
+    # sets scale applied to every image the sprite displays, including animation cells
+    # scaled images are cached like rotated ones
+    def setImgScale(self, scale):
+        self.imgScale = scale
 
+    # hidden sprites leave their groups, so they cost nothing until they are shown again
     def hide(self):
+        if self.visible:
+            self.hiddenX, self.hiddenY = self.x, self.y
         self.visible = False
-        self.hiddenX, self.hiddenY = self.x, self.hiddenY
         self.x, self.y = -10000, -10000
         self.speed = 0
+        # a sleeping sprite is not updated, so its rect is moved off-screen here to keep it from colliding
+        self.rect.center = (self.x, self.y)
+        self.scene.sleepSprite(self)
 
     def show(self):
+        if not self.visible:
+            self.x, self.y = self.hiddenX, self.hiddenY
+            self.rect.center = (self.x, self.y)
         self.visible = True
-        self.x, self.hiddenY = self.hiddenX, self.hiddenY
+        if self.awake:
+            self.scene.wakeSprite(self)
 
     def isVisible(self):
         return self.visible
 
+    # stops updating and drawing the sprite where it is without hiding it, until wake() is called
+    def sleep(self):
+        self.awake = False
+        self.scene.sleepSprite(self)
+
+    def wake(self):
+        self.awake = True
+        if self.visible:
+            self.scene.wakeSprite(self)
+
+    def isAwake(self):
+        return self.awake
+
+    # when the scene has a camera, screen space sprites stay put on the window instead of scrolling with the world
+    def setScreenSpace(self, screenSpace=True):
+        self.screenSpace = screenSpace
+
     # --------------------------------- animation -------------------------------- #
 
+    # cells are cut from imageMaster by the shared clip registry, so sprites with the same sheet and layout share one clip
     def createAnimation(self, name, numCells, cellWidth, cellHeight, cellLeft=0, cellTop=0, cellScalar=1):
-        # generate list of cells as images
-        animation = []
-        left = cellLeft
-        for i in range(numCells):
-            # create cell using imageMaster as spritesheet
-            cell = self.imageMaster.subsurface(
-                (left, cellTop, cellWidth, cellHeight))
-            cell = pygame.transform.scale_by(cell, cellScalar)
-            animation.append(cell)
+        self.__ownAnimations()
+        self.animations[name] = clips.getClip(self.imageMaster, numCells, cellWidth, cellHeight,
+                                              cellLeft, cellTop, cellScalar)
 
-            # start next cell at top right corner of this cell
-            left += cellWidth
+    # adds an AnimationClip, such as one from clips.get(), as one of the sprite's animations
+    def addAnimation(self, name, clip):
+        self.__ownAnimations()
+        self.animations[name] = clip
 
-        # add to animations dictionary
-        self.animations[name] = animation
+    # gives the sprite its own copy of the shared default animations before it adds one
+    def __ownAnimations(self):
+        if self.animations is Sprite.defaultAnimations:
+            self.animations = dict(self.animations)
 
+    # moves the playhead by the scene's elapsed time, so animations play at the same speed at any framerate
     def __animate(self):
         if (self.animate == True):
-            animation = self.animations[self.currentAnimation]
-            self.image = animation[self.currentAnimationFrame]
+            clip = self.animations[self.currentAnimation]
+            fps = self.animationFps if self.animationFps != None else clip.frameRate
+            self.currentAnimationFrame = clip.getFrameIndex(self.animationPosition)
+            self.image = clip.frames[self.currentAnimationFrame]
+            self.baseImage = self.image
 
             # image dimensions
             self.rect = self.image.get_rect()
@@ -474,16 +1651,7 @@ class Sprite(pygame.sprite.Sprite):
             self.displayedImgHeight = self.imgHeight
             self.displayedImageCenter = self.imgCenter
 
-            # increment current animation frame if counter has reached required number of ticks
-            if (self.animationTickCounter >= self.animationSpeed):
-                self.currentAnimationFrame += self.animationTickSpeed
-                if self.currentAnimationFrame == len(animation):
-                    self.currentAnimationFrame = 0
-
-            # increment animation tick counter
-            self.animationTickCounter += 1
-            if self.animationTickCounter > self.animationSpeed:
-                self.animationTickCounter = 0
+            self.animationPosition += self.scene.deltaTime * fps
 
     # starts animation
     # removes any cropping to image done before animation starts unless cropped image has been set to imageMaster
@@ -495,21 +1663,34 @@ class Sprite(pygame.sprite.Sprite):
 
     def resetAnimation(self):
         self.currentAnimationFrame = 0
+        self.animationPosition = 0.0
+
+    """
+        sets current animation's speed where speed is based upon how many frames to wait until next animation cell
+        and animationTickSpeed is how many cells to move each time
+        expects an int for speed
+        animation speed must be less than or equal to framerate
+        converted to cells per second at the scene's framerate, so the animation keeps this speed at any real framerate
+    """
 
-    # sets current animation's speed where speed is based upon how many frames to wait until next animation cell
-    # expects an int for speed
-    # animation speed must be less than or equal toframerate
     def setAnimationSpeed(self, speed, animationTickSpeed):
         if (speed <= self.scene.framerate):
             self.animationSpeed = speed
         self.animationTickSpeed = animationTickSpeed
+        self.animationFps = self.animationTickSpeed * self.scene.framerate / (self.animationSpeed + 1)
+
+    # sets how many animation cells play per second, None plays at the clip's own frame rate
+    def setAnimationFps(self, fps):
+        self.animationFps = fps
 
     # checks to see if animation name is in animations
     # expects a string
     # if name is not in dict, nothing happens
+    # switching to another animation starts it from its first cell
     def setCurrentAnimation(self, name):
-        if name in self.animations:
+        if (name in self.animations) and (name != self.currentAnimation):
             self.currentAnimation = name
+            self.resetAnimation()
 
     # ---------------------------- motion and position --------------------------- #
 
@@ -611,25 +1792,34 @@ class Sprite(pygame.sprite.Sprite):
         self.boundAction = action
 
     def checkBounds(self):
-        window_width = self.scene.surface.get_width()
-        window_height = self.scene.surface.get_height()
+        window_width, window_height = self.scene.getWorldSize()
 
         offRight = offLeft = offTop = offBottom = offScreen = False
         
-        def tileCollision(self, tile):
-            if (((self.x - (.5 * self.displayedImgWidth) - self.speed) <= tile.x + (.5 * tile.displayedImgWidth)) and # left of sprite
-                ((self.x + (.5 * self.displayedImgWidth) + self.speed) >= tile.x - (.5 * tile.displayedImgWidth)) and # right of sprite
-                ((self.y - (.5 * self.displayedImgHeight) - self.speed) <= tile.y) and # top of sprite
-                ((self.y + (.5 * self.displayedImgHeight) + self.speed) >= tile.y - (tile.displayedImgHeight))):  # bottom of sprite
-
-                return True
-            return False
-        
         collidingTile = None
 
-        for tile in self.scene.tiles:
-            if tileCollision(self, tile):
-                collidingTile = tile 
+        if self.sweptCollisions:
+            # the swept move already stopped at the first tile in the way, only the side it hit is off
+            # the hit is resolved once, so moveBy() and moveForward() do not bounce or stop on it again
+            if self.tileHitPending and (self.tileHit != None):
+                time, normalX, normalY, tile = self.tileHit
+                offRight = normalX < 0
+                offLeft = normalX > 0
+                offBottom = normalY < 0
+                offTop = normalY > 0
+            self.tileHitPending = False
+            nearbyTiles = []
+        else:
+            # only check tiles in the grid cells this sprite's speed-expanded rectangle overlaps
+            nearbyTiles = self.scene.getTilesNear(
+                self.x - (.5 * self.displayedImgWidth) - self.speed,
+                self.y - (.5 * self.displayedImgHeight) - self.speed,
+                self.x + (.5 * self.displayedImgWidth) + self.speed,
+                self.y + (.5 * self.displayedImgHeight) + self.speed)
+
+        for tile in nearbyTiles:
+            if self.tileCollision(tile):
+                collidingTile = tile
                 break
 
         if collidingTile != None:
@@ -647,17 +1837,18 @@ class Sprite(pygame.sprite.Sprite):
             # top of sprite collides with bottom of tile
             if ((self.y - (.5 * self.displayedImgHeight) - self.speed) <= tile.y):
                 offTop = True
-        
 
-        # check to see if sprite is out of bounds anywhere else in window
-        if ((self.x + (.5 * self.displayedImgWidth)) >= window_width):
-            offRight = True
-        if ((self.x - (.5 * self.displayedImgWidth)) <= 0):
-            offLeft = True
-        if ((self.y + (.5 * self.displayedImgHeight)) >= window_height):
-            offBottom = True
-        if ((self.y - (.5 * self.displayedImgHeight)) <= 0):
-            offTop = True
+        # check to see if sprite is out of bounds anywhere else in window, a world size of None has no edges
+        if window_width != None:
+            if ((self.x + (.5 * self.displayedImgWidth)) >= window_width):
+                offRight = True
+            if ((self.x - (.5 * self.displayedImgWidth)) <= 0):
+                offLeft = True
+        if window_height != None:
+            if ((self.y + (.5 * self.displayedImgHeight)) >= window_height):
+                offBottom = True
+            if ((self.y - (.5 * self.displayedImgHeight)) <= 0):
+                offTop = True
 
         # if it is out of bounds anywhere, then it is off-screen
         if offRight or offLeft or offTop or offBottom:
@@ -665,14 +1856,16 @@ class Sprite(pygame.sprite.Sprite):
 
         # wrap sprite to opposite side if bounds action is wrap
         if self.boundAction == self.WRAP:
-            if self.x > window_width:
-                self.x = 0
-            if self.x < 0:
-                self.x = window_width
-            if self.y > window_height:
-                self.y = 0
-            if self.y < 0:
-                self.y = window_height
+            if window_width != None:
+                if self.x > window_width:
+                    self.x = 0
+                if self.x < 0:
+                    self.x = window_width
+            if window_height != None:
+                if self.y > window_height:
+                    self.y = 0
+                if self.y < 0:
+                    self.y = window_height
 
         # bounce sprite off of edge of window if bounds action is bounce
         elif self.boundAction == self.BOUNCE:
@@ -696,16 +1889,59 @@ class Sprite(pygame.sprite.Sprite):
                 self.speed = 0
                 self.x, self.y = -10000, -10000
                 self.visible = False
+                self.scene.sleepSprite(self)
+
+    """
+        swept sprites move along this frame's motion only until they touch the first tile in the way
+        tiles are found with a single sweep of the sprite's rect, so fast sprites cannot pass through thin tiles
+        and slow sprites passing close to a tile do not hit it
+        checkBounds() then resolves the hit at the contact point, bouncing or stopping on the side that was hit
+        only the sweep in update() is tested against tiles, moveBy() and moveForward() only check the world's edges
+    """
+
+    def setSweptCollisions(self, sweptCollisions=True):
+        self.sweptCollisions = sweptCollisions
+
+    # returns (time, normalX, normalY, tile) of the tile the last swept move stopped at, or None
+    def getTileHit(self):
+        return self.tileHit
+
+    # moves by dx and dy, stopping where the sprite first touches a tile if its bound action bounces, stops, or hides
+    # wrapping and continuing sprites move on through tiles, as they do without swept collisions
+    def __sweep(self):
+        halfW = .5 * self.displayedImgWidth
+        halfH = .5 * self.displayedImgHeight
+        self.tileHit = self.scene.sweepTiles(self.x - halfW, self.y - halfH, self.x + halfW, self.y + halfH,
+                                             self.dx, self.dy)
+        self.tileHitPending = True
+        time = 1
+        if (self.tileHit != None) and (self.boundAction in (BOUNCE, STOP, HIDE)):
+            time = self.tileHit[0]
+        self.x += self.dx * time
+        self.y += self.dy * time
+
+    # returns true if this sprite, expanded by its speed, overlaps tile
+    # tile's x is the center of the tile and its y is the bottom of the tile
+    def tileCollision(self, tile):
+        if (((self.x - (.5 * self.displayedImgWidth) - self.speed) <= tile.x + (.5 * tile.displayedImgWidth)) and # left of sprite
+            ((self.x + (.5 * self.displayedImgWidth) + self.speed) >= tile.x - (.5 * tile.displayedImgWidth)) and # right of sprite
+            ((self.y - (.5 * self.displayedImgHeight) - self.speed) <= tile.y) and # top of sprite
+            ((self.y + (.5 * self.displayedImgHeight) + self.speed) >= tile.y - (tile.displayedImgHeight))):  # bottom of sprite
+
+            return True
+        return False
 
     def collidesWith(self, sprite):
         collision = False
         if sprite.isCollidable():
             if self.rect.colliderect(sprite.rect):
                 collision = True
+                if self.pixelPerfect or sprite.pixelPerfect:
+                    collision = masks.overlap(self, sprite)
         return collision
 
     def collidesWithGroup(self, group):
-        if pygame.sprite.spritecollideany(self, group) != None:
+        if pygame.sprite.spritecollideany(self, group, collideSprites) != None:
             return True
         return False
         #return pygame.sprite.spritecollideany(self, group)
@@ -713,25 +1949,77 @@ class Sprite(pygame.sprite.Sprite):
     def isCollidable(self):
         return self.collidable
 
+    """
+        pixel-perfect sprites only collide where their opaque pixels overlap, so transparent corners do not count
+        rects are still tested first, and masks come from the shared mask cache, so each image's mask is built once
+        a sprite that is not pixel-perfect collides with a pixel-perfect one as its whole rect
+    """
+
+    def setPixelPerfect(self, pixelPerfect=True):
+        self.pixelPerfect = pixelPerfect
+
+    # returns the cached mask of the image the sprite is showing
+    def getMask(self):
+        return masks.get(self.image)
+
+    """
+        sets which collision layers the sprite is on and which layers it collides with in the scene's collision world
+        layer and mask are bit flags, two sprites only collide if each one's layer shares a bit with the other's mask
+    """
+
+    def setCollisionLayer(self, layer, mask=ALL_LAYERS):
+        self.collisionLayer = layer
+        self.collisionMask = mask
+
+    # abstract methods called by the scene's collision world when this sprite starts, keeps, or stops overlapping other
+    def collisionEnter__(self, other):
+        pass
+
+    def collisionStay__(self, other):
+        pass
+
+    def collisionExit__(self, other):
+        pass
+
     # ------------------------------ extra utilities ----------------------------- #
 
     def isPressed(self):
         self.pressed = False
-        if (pygame.mouse.get_pressed() == (1, 0, 0)):
-            if (self.rect.collidepoint(pygame.mouse.get_pos())):
+        if (self.scene.getMouseButtons() == (1, 0, 0)):
+            if (self.rect.collidepoint(self.scene.getMousePos())):
                 self.pressed = True
 
         return self.pressed
 
+    """
+        returns True if the left mouse button was pressed and released over this sprite during this frame
+        never waits for events, the click is found by the scene's input dispatcher from the frame's events
+        the first call adds the sprite to the dispatcher, so clicks are seen from the next frame on
+    """
+
     def isClicked(self):
-        clicked = False
-        if (pygame.mouse.get_pressed() == (1, 0, 0)):
-            pygame.event.wait()
-            if (pygame.mouse.get_pressed() == (0, 0, 0)):
-                if (self.rect.collidepoint(pygame.mouse.get_pos())):
-                    clicked = True
+        if self not in self.scene.input.sprites:
+            self.scene.addInteractive(self)
+            return False
+        return self in self.scene.input.clicked
+
+    # abstract methods called by the scene's input dispatcher with the mouse button used, see Scene.addInteractive()
+    def mousePressed__(self, button):
+        pass
+
+    def mouseReleased__(self, button):
+        pass
+
+    # button was pressed and released over this sprite without being released over another sprite in between
+    def mouseClicked__(self, button):
+        pass
+
+    # abstract methods called when the mouse moves onto or off of this sprite
+    def mouseEnter__(self):
+        pass
 
-        return clicked
+    def mouseExit__(self):
+        pass
 
     def distanceToPoint(self, point):
         dx = self.x - point[0]
@@ -760,54 +2048,103 @@ class Map(pygame.sprite.Sprite):
         self.tileW = 0
         self.tileH = 0
         self.tileMap = [[0]]
-        self.boundsMap = self.tileMap
+        self.cells = bytearray(1)  # 1 for every boundary cell and 0 for every other cell, row by row
+        self.tileRects = []  # boundary cells merged into as few rects as possible, in cells instead of pixels
+        self.tileSurface = None  # tileW x tileH surface every boundary cell is drawn with
         self.tilesVisible = False
 
+        # world drawn through a scene's camera in square chunks, see getChunk()
+        self.worldWidth = None  # world size, None uses the larger of the map image and the bounds map
+        self.worldHeight = None
+        self.chunkSize = 512
+        self.chunks = {}  # (chunkX, chunkY) -> loaded chunk surface, or None for an empty chunk
+
     def setMapImage(self, image):
-        self.imageMaster = pygame.image.load(image)
-        self.imageMaster = self.imageMaster.convert()
+        self.imageMaster = resources.getImage(image, alpha=False)
         self.image = self.imageMaster
         self.rect = self.imageMaster.get_rect()
+        self.chunks = {}
 
     """
-        creates a grid of boundary tiles where each tile is a rectangular surface
+        creates a grid of boundary tiles, kept as one byte per cell in cells
+        runs of boundary cells are merged into tileRects, which scenes use for collisions instead of single cells
         tileMap2DList is a 2-D array where each item in every collumn and row is either a 1 or a 0
         1 signifies that the tile in that location is a boundary
         0 signifies that the tile in that location is not a boundary
         if an item does not have either a 1 or a 0, there will be no boundary in that specific location on the grid
         creating a bounds map overwrites any existing bounds map, so it is also a setBoundsMap() method
         also requires game so it can determine the width and height of the tiles
+        tileWidth and tileHeight set the tile size instead, so a bounds map can be larger than the window
     """
 
-    def createBoundsMap(self, tileMap2DList, game):
+    def createBoundsMap(self, tileMap2DList, game, tileWidth=None, tileHeight=None):
         self.tileMap = tileMap2DList
-        self.boundsMap = self.tileMap
-
-        self.numRows = len(self.tileMap)
-
-        maxCol = 0
-        for r in self.tileMap:
-            for c in r:
-                cLen = len(self.tileMap[c])
-                if (cLen > 0):
-                    maxCol = cLen
-        self.numCols = maxCol
-
-        self.tileW = round(game.getWindowWidth() / self.numCols)
-        self.tileH = round(game.getWindowHeight() / self.numRows)
-        r = 0
-        for row in self.tileMap:
-            c = 0
-            for col in row:
-                if (col == 1):
-                    tile = pygame.Surface((self.tileW, self.tileH))
-                    tile.fill((255, 0, 0))
-                    self.boundsMap[r][c] = tile
-                    self.numTiles += 1
+        self.numRows = len(tileMap2DList)
+        self.numCols = max([len(row) for row in tileMap2DList], default=0)
+
+        self.tileW = tileWidth if tileWidth != None else round(game.getWindowWidth() / self.numCols)
+        self.tileH = tileHeight if tileHeight != None else round(game.getWindowHeight() / self.numRows)
+
+        # cells are kept in one bytearray instead of changing tileMap2DList, which is left as it was passed in
+        self.cells = bytearray(self.numRows * self.numCols)
+        for r, row in enumerate(tileMap2DList):
+            start = r * self.numCols
+            self.cells[start:start + len(row)] = bytes([1 if col == 1 else 0 for col in row])
+        self.numTiles = self.cells.count(1)
+        self.tileRects = self.__mergeCells()
+
+        # every tile looks the same, so they all share one surface
+        self.tileSurface = pygame.Surface((self.tileW, self.tileH))
+        self.tileSurface.fill((255, 0, 0))
+
+    """
+        private method: greedy meshing of the boundary cells into rects
+        each row is split into runs of boundary cells, and a run spanning the same columns as a run in the row above
+        grows that rect down instead of starting a new one
+        rects are returned in row by row order of their top left cells
+    """
+
+    def __mergeCells(self):
+        rects = []
+        growing = {}  # (first column, end column) -> rect that reached the row above
+        for r in range(self.numRows):
+            rowStart = r * self.numCols
+            rowEnd = rowStart + self.numCols
+            reached = {}
+            first = self.cells.find(1, rowStart, rowEnd)
+            while first != -1:
+                end = self.cells.find(0, first, rowEnd)
+                if end == -1:
+                    end = rowEnd
+                run = (first - rowStart, end - rowStart)
+                rect = growing.get(run)
+                if rect != None:
+                    rect.height += 1
                 else:
-                    self.boundsMap[r][c] = 0
-                c += 1
-            r += 1
+                    rect = pygame.Rect(run[0], r, run[1] - run[0], 1)
+                    rects.append(rect)
+                reached[run] = rect
+                first = self.cells.find(1, end, rowEnd)
+            growing = reached
+        return rects
+
+    # returns True if the cell at row and col is a boundary
+    def isBoundary(self, row, col):
+        if (0 <= row < self.numRows) and (0 <= col < self.numCols):
+            return self.cells[(row * self.numCols) + col] == 1
+        return False
+
+    """
+        read-only grid of the bounds map for code written before cells replaced it, built from cells on every access
+        each row is a list holding the shared tile surface for every boundary cell and 0 for every other cell
+        use isBoundary() or cells instead in new code, they do not build a list of lists
+    """
+
+    @property
+    def boundsMap(self):
+        numCols = self.numCols
+        return [[self.tileSurface if self.cells[start + c] == 1 else 0 for c in range(numCols)]
+                for start in range(0, self.numRows * numCols, numCols)]
 
     def isBoundsMapVisible(self):
         return self.tilesVisible
@@ -822,21 +2159,147 @@ class Map(pygame.sprite.Sprite):
     def hideTiles(self):
         self.tilesVisible = False
 
+    # ---------------------------------- world ----------------------------------- #
 
-class Label(Sprite):
-    def __init__(self, scene, text=""):
-        Sprite.__init__(self, scene)
+    # sets size of the world a camera can scroll over, None uses the larger of the map image and the bounds map
+    def setWorldSize(self, width, height):
+        self.worldWidth = width
+        self.worldHeight = height
 
-        self.text = text
-        self.font = pygame.font.Font("freesansbold.ttf", 20)
-        self.fgColor = "black"
+    def getWorldSize(self):
+        if (self.worldWidth != None) and (self.worldHeight != None):
+            return (self.worldWidth, self.worldHeight)
+        return (max(self.imageMaster.get_width(), self.numCols * self.tileW),
+                max(self.imageMaster.get_height(), self.numRows * self.tileH))
+
+    # sets width and height of the square chunks the world is drawn in, unloading every chunk
+    def setChunkSize(self, chunkSize):
+        self.chunkSize = chunkSize
+        self.chunks = {}
+
+    # returns surface drawn at chunkX * chunkSize, chunkY * chunkSize in the world, creating it the first time it is needed
+    def getChunk(self, chunkX, chunkY):
+        key = (chunkX, chunkY)
+        if key not in self.chunks:
+            size = self.chunkSize
+            self.chunks[key] = self.createChunk__(chunkX, chunkY, pygame.Rect(chunkX * size, chunkY * size, size, size))
+        return self.chunks[key]
+
+    """
+        method designed to be overriden to load or generate the chunk of the world covering rect
+        returns a surface drawn at rect's top left corner, or None to leave the chunk empty
+        by default chunks are views into the map image, so no pixels are copied
+    """
+
+    def createChunk__(self, chunkX, chunkY, rect):
+        area = rect.clip(self.imageMaster.get_rect())
+        if (area.width == 0) or (area.height == 0):
+            return None
+        return self.imageMaster.subsurface(area)
+
+    # drops loaded chunks that do not overlap rect, they are created again if the camera comes back
+    def unloadChunksOutside(self, rect):
+        size = self.chunkSize
+        for chunkX, chunkY in list(self.chunks):
+            if not rect.colliderect((chunkX * size, chunkY * size, size, size)):
+                del self.chunks[(chunkX, chunkY)]
+
+    def getNumLoadedChunks(self):
+        return len(self.chunks)
+
+
+"""
+    view of a scene's world, given to a scene with Scene.setCamera()
+    x and y are the world position of the view's top left corner, width and height are the view's size on screen
+    the view is kept inside the world's width and height, a world size of None does not limit the camera
+"""
+
+class Camera(object):
+    def __init__(self, width, height, worldWidth=None, worldHeight=None):
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+        self.worldWidth = worldWidth
+        self.worldHeight = worldHeight
+        self.target = None  # sprite the camera keeps centered
+
+    def setPosition(self, x, y):
+        self.x = x
+        self.y = y
+        self.__clamp()
+
+    def move(self, dx, dy):
+        self.setPosition(self.x + dx, self.y + dy)
+
+    # centers view on (x, y) world point
+    def centerOn(self, point):
+        self.setPosition(point[0] - (.5 * self.width), point[1] - (.5 * self.height))
+
+    # keeps sprite centered every frame, None stops following
+    def follow(self, sprite):
+        self.target = sprite
+
+    def setWorldSize(self, width, height):
+        self.worldWidth = width
+        self.worldHeight = height
+        self.__clamp()
+
+    # called by the scene once sprites have moved each frame
+    def update(self):
+        if self.target != None:
+            self.centerOn(self.target.rect.center)
+
+    # returns view as a rect in world coordinates
+    def getRect(self):
+        return pygame.Rect(round(self.x), round(self.y), self.width, self.height)
+
+    def worldToScreen(self, point):
+        return (point[0] - round(self.x), point[1] - round(self.y))
+
+    def screenToWorld(self, point):
+        return (point[0] + round(self.x), point[1] + round(self.y))
+
+    def __clamp(self):
+        if self.worldWidth != None:
+            self.x = max(0, min(self.x, self.worldWidth - self.width))
+        if self.worldHeight != None:
+            self.y = max(0, min(self.y, self.worldHeight - self.height))
+
+
+class Label(Sprite):
+    def __init__(self, scene, text=""):
+        Sprite.__init__(self, scene)
+
+        self.text = text
+        self.font = resources.getFont("freesansbold.ttf", 20)
+        self.fgColor = "black"
         self.bgColor = "white"
         self.width = 200
         self.height = 50
 
         #self.center = (700, 700)
 
+        # the label's surface is only rebuilt when something it is drawn from changes
+        self.renderKey = None  # text, colors, font, size, and angle the current surface was drawn with
+        self.renderCount = 0  # frames the surface was rebuilt
+        self.reuseCount = 0  # frames the cached surface was reused
+
     def update(self):
+        renderKey = (self.text, self.fgColor, self.bgColor, self.font, self.width, self.height, self.imgAngle)
+        if renderKey != self.renderKey:
+            self.__render()
+            self.renderKey = renderKey
+            self.renderCount += 1
+        else:
+            self.reuseCount += 1
+
+        # get new center location again
+        self.rect.center = (self.x, self.y)
+        self.displayedImageCenter = self.rect.center
+
+    # draws the label's text centered on its background and rotates it
+    def __render(self):
         self.image = pygame.Surface((self.width, self.height))
         self.image.fill(self.bgColor)
 
@@ -844,26 +2307,35 @@ class Label(Sprite):
             self.text, True, self.fgColor, self.bgColor)
 
         # center the text
-        x = .5 * (self.displayedImgWidth - labelText.get_width())
-        y = .5 * (self.displayedImgHeight - labelText.get_height())
+        x = .5 * (self.width - labelText.get_width())
+        y = .5 * (self.height - labelText.get_height())
 
         # blit text onto label's surface
         self.image.blit(labelText, (x, y))
         self.rect = self.image.get_rect(center=self.rect.center)
 
         # rotate label
-        self.image = pygame.transform.rotate(self.image, self.imgAngle)
+        if self.imgAngle != 0:
+            self.image = pygame.transform.rotate(self.image, self.imgAngle)
         self.rect = self.image.get_rect(center=self.rect.center)
         self.displayedImgWidth = self.rect.width
         self.displayedImgHeight = self.rect.height
         self.displayedImageCenter = self.rect.center
 
-        # get new center location again
-        self.rect.center = (self.x, self.y)
-        self.displayedImageCenter = self.rect.center
+    # drops the label's rendered surface, it is rendered again on the next update
+    def release(self):
+        self.image = pygame.Surface((0, 0))
+        self.renderKey = None
+
+    # returns how many frames rebuilt the label's surface and how many reused the cached one
+    def getRenderStats(self):
+        return {
+            "renders": self.renderCount,
+            "reuses": self.reuseCount,
+        }
 
     def setFont(self, font="freesansbold.ttf", size=20):
-        self.font = pygame.font.Font(font, size)
+        self.font = resources.getFont(font, size)
 
     def setTextColor(self, color="black"):
         self.fgColor = color
@@ -876,33 +2348,450 @@ class Button(Label):
     def __init__(self, scene, text=""):
         Label.__init__(self, scene, text)
         self.clicked = False
+        self.unhandledClick = False  # clicked since btnClicked() last returned True
+        scene.addInteractive(self)
 
-    def update(self):
-        Label.update(self)
-
-        if (self.isClicked()):
+    def mouseClicked__(self, button):
+        if button == 1:
             self.clicked = True
+            self.unhandledClick = True
 
+    # returns True once for each click of the button
     def btnClicked(self):
-        if (self.isClicked()):
+        if self.unhandledClick:
+            self.unhandledClick = False
             return True
-        
+
         return False
 
 
+"""
+    many sprites sharing one image, stored in numpy arrays instead of one Sprite object each
+    motion and bound actions match Sprite.update() and Sprite.checkBounds() but run on every sprite at once
+    x, y, dx, dy, speed, moveAngle, boundAction, and visible are arrays, only the first count entries are in use
+    add a batch to a scene with Scene.addBatch(), the scene clears, updates, and draws it like a sprite group
+    requires numpy
+"""
+
+class SpriteBatch(object):
+    def __init__(self, scene, capacity=64):
+        if numpy == None:
+            raise ImportError("SpriteBatch requires numpy")
+
+        self.scene = scene
+        self.count = 0
+
+        # motion and position attributes
+        self.x = numpy.zeros(capacity)
+        self.y = numpy.zeros(capacity)
+        self.dx = numpy.zeros(capacity)
+        self.dy = numpy.zeros(capacity)
+        self.speed = numpy.zeros(capacity)
+        self.moveAngle = numpy.zeros(capacity)
+        self.boundAction = numpy.zeros(capacity, dtype=numpy.int8)
+        self.visible = numpy.zeros(capacity, dtype=bool)
+
+        # same placeholder image as Sprite
+        self.setImageSurface(resources.getText(
+            "DVD", "freesansbold.ttf", 30, (0, 0, 0), (0xFF, 0xFF, 0xFF)))
+
+        self.drawnLefts = None  # top left corners of sprites drawn last frame, used by clear()
+        self.drawnTops = None
+        self.tileCounts = None  # summed area table of bounds map tiles, built the first time it is needed
+        self.numTilesCounted = 0
+
+    def __len__(self):
+        return self.count
+
+    # batches hold no Sprite objects, this keeps code that loops over a group's sprites working
+    def sprites(self):
+        return []
+
+    # sets image shared by every sprite in the batch
+    def setImage(self, image):
+        self.setImageSurface(resources.getImage(image))
+
+    def setImageSurface(self, surface):
+        self.image = surface
+        self.imgWidth = surface.get_width()
+        self.imgHeight = surface.get_height()
+
+    # adds one sprite and returns its index in the batch's arrays
+    def add(self, position=(200, 200), speed=0, moveAngle=0, boundAction=WRAP):
+        index = self.count
+        self.addMany([position[0]], [position[1]], speed, moveAngle, boundAction)
+        return index
+
+    # adds one sprite per item in xs and ys, speed, moveAngle, and boundAction can be single values or sequences
+    def addMany(self, xs, ys, speed=0, moveAngle=0, boundAction=WRAP):
+        numAdded = len(xs)
+        start = self.count
+        end = start + numAdded
+        if end > len(self.x):
+            self.__grow(end)
+
+        self.x[start:end] = xs
+        self.y[start:end] = ys
+        self.dx[start:end] = 0
+        self.dy[start:end] = 0
+        self.speed[start:end] = speed
+        self.moveAngle[start:end] = moveAngle
+        self.boundAction[start:end] = boundAction
+        self.visible[start:end] = True
+        self.count = end
+
+    # doubles array capacity until it holds at least capacity sprites
+    def __grow(self, capacity):
+        newCapacity = max(len(self.x), 1)
+        while newCapacity < capacity:
+            newCapacity *= 2
+
+        for name in ("x", "y", "dx", "dy", "speed", "moveAngle", "boundAction", "visible"):
+            old = getattr(self, name)
+            new = numpy.zeros(newCapacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    # ------------------------------- group interface ------------------------------ #
+
+    # moves every sprite by its speed and move angle then applies its bound action
+    def update(self):
+        n = self.count
+        speed = self.speed[:n]
+        dx = self.dx[:n]
+        dy = self.dy[:n]
+
+        # calculate motion vector
+        theta = self.moveAngle[:n] / 180.0 * math.pi
+        numpy.multiply(numpy.cos(theta), speed, out=dx)
+        numpy.multiply(numpy.sin(theta), speed, out=dy)
+        dy *= -1
+
+        # calculate position
+        self.x[:n] += dx
+        self.y[:n] += dy
+
+        self.__checkBounds()
+
+    # blits background over where sprites were drawn last frame
+    # when the sprites overlap more than they cover, one blit over their bounding rect is cheaper
+    def clear(self, surface, background):
+        if not self.drawnLefts:
+            return
+
+        w = self.imgWidth
+        h = self.imgHeight
+        bounds = self.__boundingRect(self.drawnLefts, self.drawnTops)
+        if len(self.drawnLefts) * w * h >= bounds.width * bounds.height:
+            surface.blit(background, bounds, bounds)
+        else:
+            surface.blits([(background, (left, top), (left, top, w, h))
+                           for left, top in zip(self.drawnLefts, self.drawnTops)], False)
+
+    # draws every visible sprite with one blits() call and returns the areas that changed
+    # offset is added to every sprite's position, Scene passes the camera's negated position
+    # with an offset, sprites entirely outside surface are not drawn
+    def draw(self, surface, offset=None):
+        n = self.count
+        visible = self.visible[:n]
+        lefts = roundHalfAway(self.x[:n][visible]).astype(numpy.int64) - (self.imgWidth // 2)
+        tops = roundHalfAway(self.y[:n][visible]).astype(numpy.int64) - (self.imgHeight // 2)
+        if offset != None:
+            lefts += offset[0]
+            tops += offset[1]
+            onScreen = ((lefts + self.imgWidth > 0) & (lefts < surface.get_width()) &
+                        (tops + self.imgHeight > 0) & (tops < surface.get_height()))
+            lefts = lefts[onScreen]
+            tops = tops[onScreen]
+
+        changed = []
+        if self.drawnLefts:
+            changed.append(self.__boundingRect(self.drawnLefts, self.drawnTops))
+
+        self.drawnLefts = lefts.tolist()
+        self.drawnTops = tops.tolist()
+        if self.drawnLefts:
+            surface.blits(zip(repeat(self.image), zip(self.drawnLefts, self.drawnTops)), False)
+            changed.append(self.__boundingRect(self.drawnLefts, self.drawnTops))
+        return changed
+
+    # returns rect around sprites whose top left corners are at lefts and tops
+    def __boundingRect(self, lefts, tops):
+        left = min(lefts)
+        top = min(tops)
+        return pygame.Rect(left, top, max(lefts) - left + self.imgWidth, max(tops) - top + self.imgHeight)
+
+    # ---------------------------- bounds and collisions --------------------------- #
+
+    # same rules as Sprite.checkBounds() applied to every sprite at once
+    def __checkBounds(self):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        dx = self.dx[:n]
+        dy = self.dy[:n]
+        speed = self.speed[:n]
+        boundAction = self.boundAction[:n]
+        windowWidth, windowHeight = self.scene.getWorldSize()
+        halfW = .5 * self.imgWidth
+        halfH = .5 * self.imgHeight
+
+        # a tile collision sets every side as off-screen, just like Sprite.checkBounds()
+        tileHits = self.__tileHits(x, y, speed, halfW, halfH)
+
+        # a world size of None has no edges on that axis
+        if windowWidth != None:
+            offRight = (x + halfW) >= windowWidth
+            offLeft = (x - halfW) <= 0
+        else:
+            offRight = numpy.zeros(n, dtype=bool)
+            offLeft = numpy.zeros(n, dtype=bool)
+        if windowHeight != None:
+            offBottom = (y + halfH) >= windowHeight
+            offTop = (y - halfH) <= 0
+        else:
+            offBottom = numpy.zeros(n, dtype=bool)
+            offTop = numpy.zeros(n, dtype=bool)
+        if tileHits is not None:
+            offRight |= tileHits
+            offLeft |= tileHits
+            offBottom |= tileHits
+            offTop |= tileHits
+        offScreen = offRight | offLeft | offTop | offBottom
+
+        # wrap sprite to opposite side if bounds action is wrap
+        wrap = boundAction == WRAP
+        if windowWidth != None:
+            x[wrap & (x > windowWidth)] = 0
+            x[wrap & (x < 0)] = windowWidth
+        if windowHeight != None:
+            y[wrap & (y > windowHeight)] = 0
+            y[wrap & (y < 0)] = windowHeight
+
+        # bounce sprite off of edge of window if bounds action is bounce, then update its vector
+        bounce = boundAction == BOUNCE
+        dx[bounce & (offLeft | offRight)] *= -1
+        dy[bounce & (offTop | offBottom)] *= -1
+        speed[bounce] = numpy.sqrt((dx[bounce] * dx[bounce]) + (dy[bounce] * dy[bounce]))
+        self.moveAngle[:n][bounce] = numpy.arctan2(dy[bounce] * -1, dx[bounce]) / math.pi * 180
+
+        # stop sprite from moving if bounds action is stop
+        speed[(boundAction == STOP) & offScreen] = 0
+
+        # make sprite invisible and stop it from moving if its bounds action is hide
+        hide = (boundAction == HIDE) & offScreen
+        speed[hide] = 0
+        x[hide] = -10000
+        y[hide] = -10000
+        self.visible[:n][hide] = False
+
+    # returns array of which sprites, expanded by their speed, touch a bounds map tile, or None if there are no tiles
+    def __tileHits(self, x, y, speed, halfW, halfH):
+        scene = self.scene
+        tileW = scene.map.tileW
+        tileH = scene.map.tileH
+        if (not scene.tiles) or (tileW <= 0) or (tileH <= 0):
+            return None
+
+        # summed area table: tileCounts[r, c] is the number of boundary cells above and left of row r, column c
+        if (self.tileCounts is None) or (self.numTilesCounted != len(scene.tiles)):
+            numRows = scene.map.numRows
+            numCols = scene.map.numCols
+            grid = numpy.frombuffer(bytes(scene.map.cells), dtype=numpy.uint8).reshape(numRows, numCols).astype(numpy.int64)
+            self.tileCounts = numpy.zeros((numRows + 1, numCols + 1), dtype=numpy.int64)
+            self.tileCounts[1:, 1:] = grid.cumsum(0).cumsum(1)
+            self.numTilesCounted = len(scene.tiles)
+
+        # same cell range as Scene.getTilesNear()
+        numRows = self.tileCounts.shape[0] - 1
+        numCols = self.tileCounts.shape[1] - 1
+        firstCol = numpy.maximum(numpy.ceil((x - halfW - speed) / tileW) - 1, 0)
+        lastCol = numpy.minimum(numpy.floor((x + halfW + speed) / tileW), numCols - 1)
+        firstRow = numpy.maximum(numpy.ceil((y - halfH - speed) / tileH) - 1, 0)
+        lastRow = numpy.minimum(numpy.floor((y + halfH + speed) / tileH), numRows - 1)
+        inRange = (firstCol <= lastCol) & (firstRow <= lastRow)
+
+        firstCol = numpy.clip(firstCol, 0, numCols - 1).astype(numpy.int64)
+        lastCol = numpy.clip(lastCol, 0, numCols - 1).astype(numpy.int64) + 1
+        firstRow = numpy.clip(firstRow, 0, numRows - 1).astype(numpy.int64)
+        lastRow = numpy.clip(lastRow, 0, numRows - 1).astype(numpy.int64) + 1
+        counts = self.tileCounts
+        numTiles = (counts[lastRow, lastCol] - counts[firstRow, lastCol]
+                    - counts[lastRow, firstCol] + counts[firstRow, firstCol])
+        return inRange & (numTiles > 0)
+
+
+"""
+    sound effect played through the shared SoundEngine 'audio', so many copies can play at once on separate channels
+    the decoded sound is shared through the resource cache, so creating the same sound again does not reread the file
+    priority decides which sounds may cut off others when every channel is busy, higher priorities win
+    maxVoices is how many copies of this sound can play at once, playing another restarts the oldest copy
+"""
+
 class Sound():
+    def __init__(self, filename, priority=0, maxVoices=4):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self.sound = resources.getSound(filename)
+        self.priority = priority
+        self.maxVoices = maxVoices
+        self.volume = 1.0
+
+    # plays the sound once, or loops more times after the first, returns the channel used or None if it was dropped
+    def play(self, loops=0):
+        return audio.play(self.sound, self.priority, self.maxVoices, self.volume, loops)
+
+    # stops every copy of the sound that is playing
+    def stop(self):
+        self.sound.stop()
+
+    # fades out every copy of the sound over time milliseconds
+    def fadeOut(self, time=1000):
+        self.sound.fadeout(time)
+
+    def setVolume(self, volume):
+        self.volume = volume
+
+    def setPriority(self, priority):
+        self.priority = priority
+
+    def setMaxVoices(self, maxVoices):
+        self.maxVoices = maxVoices
+
+
+"""
+    background music streamed from disk through pygame.mixer.music instead of decoded into memory
+    pygame streams one music file at a time, so playing a Music stops any other Music that is playing
+    music does not use the SoundEngine's channels, so sound effects never cut it off
+"""
+
+class Music():
     def __init__(self, filename):
-        pygame.mixer.init()
-        pygame.mixer.music.load(filename)
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self.filename = filename
+        self.volume = 1.0
 
-    def play(self):
-        pygame.mixer.music.play()
+    # loops is how many times to repeat after the first play, -1 repeats forever
+    def play(self, loops=-1, fadeIn=0):
+        pygame.mixer.music.load(self.filename)
+        pygame.mixer.music.set_volume(self.volume)
+        pygame.mixer.music.play(loops, fade_ms=fadeIn)
 
     def stop(self):
         pygame.mixer.music.stop()
 
-    def fadeOut(self):
-        pygame.mixer.music.fadeOut()
+    def pause(self):
+        pygame.mixer.music.pause()
+
+    def unpause(self):
+        pygame.mixer.music.unpause()
+
+    # fades out the music over time milliseconds
+    def fadeOut(self, time=1000):
+        pygame.mixer.music.fadeout(time)
+
+    def setVolume(self, volume):
+        self.volume = volume
+        pygame.mixer.music.set_volume(volume)
+
+    def isPlaying(self):
+        return pygame.mixer.music.get_busy()
+
+
+"""
+    plays sound effects on a fixed pool of mixer channels, shared by every Sound through 'audio'
+    each sound can only take up maxVoices channels, a new copy past the limit restarts the oldest copy on its channel
+    when every channel is busy, the oldest sound with the lowest priority is cut off if its priority is not higher
+    than the new sound's, otherwise the new sound is dropped
+"""
+
+class SoundEngine(object):
+    def __init__(self, numChannels=16):
+        self.numChannels = numChannels
+        self.channels = None  # pygame.mixer.Channel objects, created when the first sound plays
+        self.voices = []  # (sound, priority, play number) last played on each channel
+        self.numPlayed = 0
+        self.numStolen = 0  # sounds cut off to free a channel for another sound
+        self.numDropped = 0  # sounds not played because no channel or voice could be given to them
+
+    # sets how many sounds can play at once, stops every sound playing
+    def setNumChannels(self, numChannels):
+        self.numChannels = numChannels
+        if self.channels != None:
+            self.stopAll()
+            self.channels = None
+
+    def play(self, sound, priority=0, maxVoices=None, volume=1.0, loops=0):
+        if self.channels == None:
+            self.__createChannels()
+
+        # find a free channel while finding the oldest copy of this sound and the oldest sound of the lowest priority
+        free = None
+        numVoices = 0
+        oldestVoice = None
+        lowest = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                if free == None:
+                    free = i
+                continue
+            playing, playingPriority, number = self.voices[i]
+            if playing is sound:
+                numVoices += 1
+                if (oldestVoice == None) or (number < self.voices[oldestVoice][2]):
+                    oldestVoice = i
+            if ((lowest == None) or (playingPriority < self.voices[lowest][1]) or
+                    ((playingPriority == self.voices[lowest][1]) and (number < self.voices[lowest][2]))):
+                lowest = i
+
+        # the sound is dropped when maxVoices is 0, there are no channels, or every channel holds a higher priority sound
+        if (maxVoices != None) and (numVoices >= maxVoices):
+            index = oldestVoice
+        elif free != None:
+            index = free
+        elif (lowest != None) and (self.voices[lowest][1] <= priority):
+            index = lowest
+            self.numStolen += 1
+        else:
+            index = None
+        if index == None:
+            self.numDropped += 1
+            return None
+
+        channel = self.channels[index]
+        channel.play(sound, loops)
+        channel.set_volume(volume)
+        self.voices[index] = (sound, priority, self.numPlayed)
+        self.numPlayed += 1
+        return channel
+
+    def stopAll(self):
+        if self.channels != None:
+            for channel in self.channels:
+                channel.stop()
+
+    # returns number of channels playing a sound
+    def getNumPlaying(self):
+        if self.channels == None:
+            return 0
+        return sum(1 for channel in self.channels if channel.get_busy())
+
+    def getStats(self):
+        return {
+            "played": self.numPlayed,
+            "stolen": self.numStolen,
+            "dropped": self.numDropped,
+            "playing": self.getNumPlaying(),
+            "channels": self.numChannels,
+        }
+
+    def __createChannels(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        pygame.mixer.set_num_channels(self.numChannels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.numChannels)]
+        self.voices = [(None, 0, 0)] * self.numChannels
 
 
 class Timer():
@@ -944,7 +2833,1602 @@ class Timer():
         pygame.time.set_timer(event, duration)
 
 
+
+"""
+    finds every pair of overlapping sprites in a scene once per frame
+    sprites are binned into a spatial hash of cellSize cells, so only sprites sharing a cell are compared
+    sprites that are not collidable, not visible, or asleep are skipped
+    pairs with a pixel-perfect sprite must also overlap pixel by pixel, see Sprite.setPixelPerfect()
+    each frame, both sprites of a pair get collisionEnter__(), collisionStay__(), or collisionExit__() called with the other sprite
+    callbacks added with onEnter(), onStay(), and onExit() are called with both sprites of the pair
+"""
+
+class CollisionWorld(object):
+    def __init__(self, cellSize=128):
+        self.cellSize = cellSize
+        self.sprites = {}  # sprite -> None, a dict keeps the order sprites were added with fast removal
+        self.pairs = []  # pairs overlapping during the last step, in the order the sprites were added
+        self.contacts = set()  # same pairs as a set for finding which pairs are new
+        self.contactsBySprite = None  # sprite -> overlapping sprites, built the first time it is needed each step
+        self.enterCallbacks = []
+        self.stayCallbacks = []
+        self.exitCallbacks = []
+
+    def add(self, sprite):
+        self.sprites[sprite] = None
+
+    def remove(self, sprite):
+        self.sprites.pop(sprite, None)
+
+    def setCellSize(self, cellSize):
+        self.cellSize = cellSize
+
+    def onEnter(self, callback):
+        self.enterCallbacks.append(callback)
+
+    def onStay(self, callback):
+        self.stayCallbacks.append(callback)
+
+    def onExit(self, callback):
+        self.exitCallbacks.append(callback)
+
+    # finds overlapping pairs and calls enter, stay, and exit callbacks
+    def step(self):
+        pairs = self.findPairs()
+        contacts = set(pairs)
+
+        for pair in pairs:
+            a, b = pair
+            if pair in self.contacts:
+                a.collisionStay__(b)
+                b.collisionStay__(a)
+                for callback in self.stayCallbacks:
+                    callback(a, b)
+            else:
+                a.collisionEnter__(b)
+                b.collisionEnter__(a)
+                for callback in self.enterCallbacks:
+                    callback(a, b)
+
+        for pair in self.pairs:
+            if pair not in contacts:
+                a, b = pair
+                a.collisionExit__(b)
+                b.collisionExit__(a)
+                for callback in self.exitCallbacks:
+                    callback(a, b)
+
+        self.pairs = pairs
+        self.contacts = contacts
+        self.contactsBySprite = None
+
+    """
+        returns list of (sprite, sprite) pairs whose rects currently overlap
+        every sprite is added to each cell its rect covers
+        a pair found in more than one cell is only kept by the cell holding the top left corner of the overlap
+    """
+
+    def findPairs(self):
+        cellSize = self.cellSize
+        cells = {}
+        active = []
+        for sprite in self.sprites:
+            if not (sprite.collidable and sprite.visible and sprite.awake):
+                continue
+            index = len(active)
+            active.append(sprite)
+            rect = sprite.rect
+            for cellX in range(rect.left // cellSize, ((rect.right - 1) // cellSize) + 1):
+                for cellY in range(rect.top // cellSize, ((rect.bottom - 1) // cellSize) + 1):
+                    cell = cells.get((cellX, cellY))
+                    if cell == None:
+                        cells[(cellX, cellY)] = [index]
+                    else:
+                        cell.append(index)
+
+        pairs = []
+        for (cellX, cellY), cell in cells.items():
+            numInCell = len(cell)
+            if numInCell < 2:
+                continue
+            for i in range(numInCell - 1):
+                a = active[cell[i]]
+                rectA = a.rect
+                for j in range(i + 1, numInCell):
+                    b = active[cell[j]]
+                    if not ((a.collisionLayer & b.collisionMask) and (b.collisionLayer & a.collisionMask)):
+                        continue
+                    rectB = b.rect
+                    if rectA.colliderect(rectB):
+                        if ((max(rectA.left, rectB.left) // cellSize == cellX) and
+                                (max(rectA.top, rectB.top) // cellSize == cellY)):
+                            if (a.pixelPerfect or b.pixelPerfect) and not masks.overlap(a, b):
+                                continue
+                            pairs.append((a, b))
+        return pairs
+
+    # returns list of sprites that were overlapping sprite during the last step
+    def getContacts(self, sprite):
+        if self.contactsBySprite == None:
+            self.contactsBySprite = {}
+            for a, b in self.pairs:
+                self.contactsBySprite.setdefault(a, []).append(b)
+                self.contactsBySprite.setdefault(b, []).append(a)
+        return self.contactsBySprite.get(sprite, [])
+
+
+"""
+    sends mouse events from a scene's main loop to the sprites under the cursor, never waiting for events
+    sprites are binned into a spatial hash of cellSize cells, rebuilt at most once a frame on the first mouse event
+    only the topmost visible sprite under the cursor gets each event, sprites in later groups are on top
+    of sprites in earlier groups and sprites added later are on top within a group
+    sprites get mousePressed__(), mouseReleased__(), mouseClicked__(), mouseEnter__(), and mouseExit__() called
+"""
+
+class InputDispatcher(object):
+    def __init__(self, groups, cellSize=128):
+        self.groups = groups  # scene's groups in the order they are drawn
+        self.cellSize = cellSize
+        self.sprites = {}  # sprite -> number of sprites added before it
+        self.numAdded = 0
+        self.cells = None  # (cellX, cellY) -> list of (drawing order, sprite), None until needed this frame
+        self.hovered = None  # sprite under the cursor after the last mouse motion
+        self.pressed = {}  # mouse button -> sprite it was pressed over
+        self.clicked = set()  # sprites clicked with the left mouse button this frame
+        self.camera = None  # scene's Camera, mouse positions are converted to world coordinates through it
+
+    def add(self, sprite):
+        if sprite not in self.sprites:
+            self.sprites[sprite] = self.numAdded
+            self.numAdded += 1
+            self.cells = None
+
+    def remove(self, sprite):
+        self.sprites.pop(sprite, None)
+        self.cells = None
+        self.clicked.discard(sprite)
+        if self.hovered is sprite:
+            self.hovered = None
+        for button in [button for button, pressed in self.pressed.items() if pressed is sprite]:
+            del self.pressed[button]
+
+    def setCellSize(self, cellSize):
+        self.cellSize = cellSize
+        self.cells = None
+
+    # called before the frame's events, sprites may have moved since the spatial hash was built
+    def beginFrame(self):
+        self.cells = None
+        if self.clicked:
+            self.clicked = set()
+
+    def handleEvent(self, event):
+        if not self.sprites:
+            return
+
+        if event.type == pygame.MOUSEMOTION:
+            sprite = self.getSpriteAt(event.pos)
+            if sprite is not self.hovered:
+                if self.hovered != None:
+                    self.hovered.mouseExit__()
+                self.hovered = sprite
+                if sprite != None:
+                    sprite.mouseEnter__()
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            sprite = self.getSpriteAt(event.pos)
+            if sprite != None:
+                self.pressed[event.button] = sprite
+                sprite.mousePressed__(event.button)
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            pressed = self.pressed.pop(event.button, None)
+            sprite = self.getSpriteAt(event.pos)
+            if sprite != None:
+                sprite.mouseReleased__(event.button)
+                if sprite is pressed:
+                    if event.button == 1:
+                        self.clicked.add(sprite)
+                    sprite.mouseClicked__(event.button)
+
+    # returns topmost visible sprite whose rect contains the (x, y) screen point, or None
+    def getSpriteAt(self, point):
+        if self.cells == None:
+            self.__buildCells()
+        if self.camera != None:
+            point = self.camera.screenToWorld(point)
+
+        topmost = None
+        topmostOrder = None
+        for order, sprite, rect in self.cells.get((point[0] // self.cellSize, point[1] // self.cellSize), ()):
+            if ((topmostOrder == None) or (order > topmostOrder)) and rect.collidepoint(point):
+                topmost = sprite
+                topmostOrder = order
+        return topmost
+
+    # bins every visible sprite into each cell its world rect covers with its drawing order
+    # screen space sprites are moved by the camera's position so they stay under the cursor
+    def __buildCells(self):
+        cellSize = self.cellSize
+        groupIndex = {group: i for i, group in enumerate(self.groups)
+                      if isinstance(group, pygame.sprite.AbstractGroup)}
+
+        self.cells = {}
+        for sprite, added in self.sprites.items():
+            if not (getattr(sprite, "visible", True) and getattr(sprite, "awake", True)):
+                continue
+            drawnIn = [groupIndex[group] for group in sprite.groups() if group in groupIndex]
+            order = (max(drawnIn) if drawnIn else -1, added)
+            rect = sprite.rect
+            if (self.camera != None) and getattr(sprite, "screenSpace", False):
+                view = self.camera.getRect()
+                rect = rect.move(view.x, view.y)
+            for cellX in range(rect.left // cellSize, ((rect.right - 1) // cellSize) + 1):
+                for cellY in range(rect.top // cellSize, ((rect.bottom - 1) // cellSize) + 1):
+                    cell = self.cells.get((cellX, cellY))
+                    if cell == None:
+                        self.cells[(cellX, cellY)] = [(order, sprite, rect)]
+                    else:
+                        cell.append((order, sprite, rect))
+
+
+# ------------------------------ input recording ------------------------------ #
+# the log starts with a header of INPUT_LOG_MAGIC, version, random seed, and seconds per simulation step
+# each frame is a flags byte, then the frame's events, key state, and mouse state if its flags say they are there,
+# then the number of simulation steps the frame ran, key and mouse state are only written when they change
+# a flags byte of INPUT_LOG_END ends the log, followed by the length and text of the state the recording ended in
+INPUT_LOG_MAGIC = b"PYIN"
+INPUT_LOG_VERSION = 1
+INPUT_LOG_HEADER = struct.Struct("<4sBqd")
+INPUT_LOG_EVENTS = 1
+INPUT_LOG_KEYS = 2
+INPUT_LOG_MOUSE = 4
+INPUT_LOG_END = 255
+
+# attributes saved for each type of event, events of other types, like window events, are not recorded
+# each attribute is a struct format, or "s" for text
+RECORDED_EVENTS = {
+    pygame.QUIT: (),
+    pygame.KEYDOWN: (("key", "i"), ("mod", "H"), ("scancode", "H"), ("unicode", "s")),
+    pygame.KEYUP: (("key", "i"), ("mod", "H"), ("scancode", "H"), ("unicode", "s")),
+    pygame.MOUSEMOTION: (("pos", "2h"), ("rel", "2h"), ("buttons", "3B")),
+    pygame.MOUSEBUTTONDOWN: (("pos", "2h"), ("button", "B")),
+    pygame.MOUSEBUTTONUP: (("pos", "2h"), ("button", "B")),
+    pygame.MOUSEWHEEL: (("x", "i"), ("y", "i")),
+    pygame.TEXTINPUT: (("text", "s"),),
+}
+
+"""
+    writes each frame's input to a compact binary log that InputReplay feeds back into a scene
+    created by Scene.startRecording(), which seeds random with seed and records at stepTime seconds per simulation step
+    an idle frame takes 2 bytes, events add a few bytes each and key or mouse changes a few more
+"""
+
+class InputRecorder(object):
+    def __init__(self, filename, seed, stepTime):
+        self.file = open(filename, "wb")
+        self.file.write(INPUT_LOG_HEADER.pack(INPUT_LOG_MAGIC, INPUT_LOG_VERSION, seed, stepTime))
+        self.numFrames = 0
+        self.keys = None  # last key state written, as a tuple of pressed scancodes
+        self.mouse = None  # last mouse position and buttons written
+
+    # writes one frame's events, the number of simulation steps it ran, and its key and mouse state
+    def recordFrame(self, events, numSteps, keys, mousePos, mouseButtons):
+        flags = 0
+        data = []
+
+        recorded = [event for event in events if event.type in RECORDED_EVENTS]
+        if recorded:
+            flags |= INPUT_LOG_EVENTS
+            data.append(struct.pack("<H", len(recorded)))
+            for event in recorded:
+                data.append(self.__packEvent(event))
+
+        pressed = tuple(i for i, down in enumerate(keys) if down)
+        if pressed != self.keys:
+            flags |= INPUT_LOG_KEYS
+            data.append(struct.pack("<H{}H".format(len(pressed)), len(pressed), *pressed))
+            self.keys = pressed
+
+        mouse = (mousePos[0], mousePos[1], sum(1 << i for i, down in enumerate(mouseButtons[:3]) if down))
+        if mouse != self.mouse:
+            flags |= INPUT_LOG_MOUSE
+            data.append(struct.pack("<hhB", *mouse))
+            self.mouse = mouse
+
+        if numSteps >= INPUT_LOG_END:
+            raise ValueError("too many simulation steps in one frame: {}".format(numSteps))
+        self.file.write(bytes([flags]) + b"".join(data) + bytes([numSteps]))
+        self.numFrames += 1
+
+    # ends the log with the text of the state the recording ended in, and closes the file
+    def close(self, finalState=None):
+        if self.file == None:
+            return
+        text = (finalState if finalState != None else "").encode("utf-8")
+        self.file.write(bytes([INPUT_LOG_END]) + struct.pack("<I", len(text)) + text)
+        self.file.close()
+        self.file = None
+
+    def getNumFrames(self):
+        return self.numFrames
+
+    # private method: packs an event's type and its recorded attributes
+    def __packEvent(self, event):
+        data = [struct.pack("<I", event.type)]
+        for name, format in RECORDED_EVENTS[event.type]:
+            value = getattr(event, name)
+            if format == "s":
+                text = value.encode("utf-8")
+                data.append(struct.pack("<B", len(text)) + text)
+            elif isinstance(value, (tuple, list)):
+                data.append(struct.pack("<" + format, *value))
+            else:
+                data.append(struct.pack("<" + format, value))
+        return b"".join(data)
+
+
+"""
+    reads a log written by InputRecorder and hands it to a scene one frame at a time, see Scene.startReplay()
+    after nextFrame() the frame's events, keys, mouse state, and numSteps are in its attributes
+    keys can be indexed by keys like pygame.K_SPACE, the same as the result of pygame.key.get_pressed()
+    a log cut short, like one from a game that quit without stopping its recording, replays up to where it ends
+"""
+
+class InputReplay(object):
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self.data = file.read()
+        magic, version, self.seed, self.stepTime = INPUT_LOG_HEADER.unpack_from(self.data, 0)
+        if (magic != INPUT_LOG_MAGIC) or (version != INPUT_LOG_VERSION):
+            raise ValueError("not a version {} input log: {}".format(INPUT_LOG_VERSION, filename))
+        self.offset = INPUT_LOG_HEADER.size
+        self.frame = 0  # number of frames replayed
+        self.events = []
+        self.numSteps = 0
+        self.keys = pygame.key.ScancodeWrapper([False] * len(pygame.key.get_pressed()))
+        self.mousePos = (0, 0)
+        self.mouseButtons = (False, False, False)
+        self.recordedState = None  # state the recording ended in, None if the log has none
+        self.replayedState = None  # state the replay ended in, set by finish()
+
+    # moves to the next frame, returns False once every frame has been replayed
+    def nextFrame(self):
+        data = self.data
+        if self.offset >= len(data):
+            return False
+        flags = data[self.offset]
+        self.offset += 1
+        if flags == INPUT_LOG_END:
+            length, = struct.unpack_from("<I", data, self.offset)
+            self.offset += 4
+            self.recordedState = data[self.offset:self.offset + length].decode("utf-8") or None
+            self.offset = len(data)
+            return False
+
+        self.events = []
+        if flags & INPUT_LOG_EVENTS:
+            numEvents, = struct.unpack_from("<H", data, self.offset)
+            self.offset += 2
+            for i in range(numEvents):
+                self.events.append(self.__unpackEvent())
+
+        if flags & INPUT_LOG_KEYS:
+            numPressed, = struct.unpack_from("<H", data, self.offset)
+            pressed = struct.unpack_from("<{}H".format(numPressed), data, self.offset + 2)
+            self.offset += 2 + (2 * numPressed)
+            keys = [False] * len(self.keys)
+            for scancode in pressed:
+                keys[scancode] = True
+            self.keys = pygame.key.ScancodeWrapper(keys)
+
+        if flags & INPUT_LOG_MOUSE:
+            x, y, buttons = struct.unpack_from("<hhB", data, self.offset)
+            self.offset += 5
+            self.mousePos = (x, y)
+            self.mouseButtons = tuple(bool(buttons & (1 << i)) for i in range(3))
+
+        self.numSteps = data[self.offset]
+        self.offset += 1
+        self.frame += 1
+        return True
+
+    # called by the scene when the replay ends with the state it ended in
+    def finish(self, replayedState):
+        self.replayedState = replayedState
+        # read the end of the log if the scene stopped before it
+        frame = self.frame
+        while self.nextFrame():
+            pass
+        self.frame = frame
+
+    # returns True if the replay ended in the state the recording did, None if the log saved no state
+    def matches(self):
+        if self.recordedState == None:
+            return None
+        return self.recordedState == self.replayedState
+
+    def getNumFrames(self):
+        return self.frame
+
+    def getRecordedState(self):
+        return self.recordedState
+
+    def getReplayedState(self):
+        return self.replayedState
+
+    # private method: unpacks an event's type and its recorded attributes
+    def __unpackEvent(self):
+        data = self.data
+        type, = struct.unpack_from("<I", data, self.offset)
+        self.offset += 4
+        attributes = {}
+        for name, format in RECORDED_EVENTS[type]:
+            if format == "s":
+                length = data[self.offset]
+                attributes[name] = data[self.offset + 1:self.offset + 1 + length].decode("utf-8")
+                self.offset += 1 + length
+            else:
+                values = struct.unpack_from("<" + format, data, self.offset)
+                self.offset += struct.calcsize("<" + format)
+                attributes[name] = values if len(values) > 1 else values[0]
+        return pygame.event.Event(type, attributes)
+
+
+"""
+    times each phase of a scene's main loop, listed in PROFILER_PHASES, and the update of each sprite class
+    the last capacity frames are kept in a ring buffer that is written to in place, so recording does not allocate
+    timings can be read with getFrames(), getAverages(), and getClassTimes(), shown on screen with showOverlay(),
+    or written to a CSV or JSON file every few frames with setDump()
+    turned on and off with Scene.enableProfiler() and Scene.disableProfiler()
+"""
+
+class FrameProfiler(object):
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.numColumns = len(PROFILER_PHASES) + 1  # every phase plus the frame's total time
+        self.phaseIndex = {phase: i for i, phase in enumerate(PROFILER_PHASES)}
+        self.samples = array("d", bytes(8 * capacity * self.numColumns))  # seconds, one row of columns per frame
+        self.current = array("d", bytes(8 * self.numColumns))  # seconds of the frame being timed
+        self.emptyFrame = array("d", bytes(8 * self.numColumns))
+        self.numFrames = 0  # frames recorded since created or reset
+        self.frameStart = 0
+        self.lastMark = 0
+        self.classTimes = {}  # sprite class name -> seconds spent in update() since created or reset
+
+        self.overlayVisible = False
+        self.overlayFont = None
+
+        self.dumpFilename = None
+        self.dumpEvery = 0
+        self.lastDumpFrame = 0
+
+    # ------------------------------- recording -------------------------------- #
+
+    # starts timing a frame, dropping any timings left from a frame that was not ended
+    def beginFrame(self):
+        self.current[:] = self.emptyFrame
+        self.frameStart = time.perf_counter()
+        self.lastMark = self.frameStart
+
+    # adds time since the last mark to phase
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.current[self.phaseIndex[phase]] += now - self.lastMark
+        self.lastMark = now
+
+    # copies the frame's timings into the ring buffer and dumps them if a dump is due
+    def endFrame(self):
+        current = self.current
+        current[-1] = time.perf_counter() - self.frameStart
+        start = (self.numFrames % self.capacity) * self.numColumns
+        self.samples[start:start + self.numColumns] = current
+        self.numFrames += 1
+
+        if (self.dumpFilename != None) and (self.numFrames - self.lastDumpFrame >= self.dumpEvery):
+            self.dump(self.dumpFilename)
+
+    # updates each sprite in group, adding the time each update takes to its class
+    def updateGroup(self, group):
+        classTimes = self.classTimes
+        if isinstance(group, pygame.sprite.AbstractGroup):
+            for sprite in group.sprites():
+                start = time.perf_counter()
+                sprite.update()
+                name = type(sprite).__name__
+                classTimes[name] = classTimes.get(name, 0.0) + (time.perf_counter() - start)
+        else:
+            # groups that are not pygame groups, like SpriteBatch, are timed as a whole
+            start = time.perf_counter()
+            group.update()
+            name = type(group).__name__
+            classTimes[name] = classTimes.get(name, 0.0) + (time.perf_counter() - start)
+
+    def reset(self):
+        self.numFrames = 0
+        self.lastDumpFrame = 0
+        self.classTimes = {}
+
+    # ------------------------------- reading ---------------------------------- #
+
+    # returns list of the kept frames, oldest first, each a dictionary of phase -> ms plus "total"
+    def getFrames(self, numFrames=None):
+        kept = min(self.numFrames, self.capacity)
+        if numFrames != None:
+            kept = min(kept, numFrames)
+
+        frames = []
+        for frame in range(self.numFrames - kept, self.numFrames):
+            start = (frame % self.capacity) * self.numColumns
+            row = self.samples[start:start + self.numColumns]
+            timings = {phase: row[i] * 1000 for i, phase in enumerate(PROFILER_PHASES)}
+            timings["total"] = row[-1] * 1000
+            frames.append(timings)
+        return frames
+
+    # returns dictionary of phase -> average ms over the last numFrames kept frames, plus "total"
+    def getAverages(self, numFrames=None):
+        frames = self.getFrames(numFrames)
+        averages = {}
+        for phase in PROFILER_PHASES + ("total",):
+            averages[phase] = (sum(frame[phase] for frame in frames) / len(frames)) if frames else 0.0
+        return averages
+
+    # returns dictionary of sprite class name -> average ms per frame spent in update()
+    def getClassTimes(self):
+        frames = max(self.numFrames, 1)
+        return {name: seconds * 1000 / frames for name, seconds in self.classTimes.items()}
+
+    # ------------------------------- dumping ---------------------------------- #
+
+    # writes timings to filename every everyFrames frames, filenames ending in .json are JSON and anything else is CSV
+    # a filename of None stops dumping
+    def setDump(self, filename, everyFrames=300):
+        self.dumpFilename = filename
+        self.dumpEvery = max(everyFrames, 1)
+        self.lastDumpFrame = self.numFrames
+
+    """
+        CSV dumps append one row per frame recorded since the last dump
+        JSON dumps overwrite filename with the kept frames, their averages, and the sprite class times
+    """
+
+    def dump(self, filename):
+        newFrames = self.getFrames(self.numFrames - self.lastDumpFrame)
+        self.lastDumpFrame = self.numFrames
+
+        if filename.endswith(".json"):
+            with open(filename, "w") as file:
+                json.dump({"averages": self.getAverages(), "classTimes": self.getClassTimes(),
+                           "frames": self.getFrames()}, file)
+            return
+
+        columns = PROFILER_PHASES + ("total",)
+        writeHeader = (not os.path.isfile(filename)) or (os.path.getsize(filename) == 0)
+        with open(filename, "a") as file:
+            if writeHeader:
+                file.write(",".join(columns) + "\n")
+            for frame in newFrames:
+                file.write(",".join("{:.4f}".format(frame[column]) for column in columns) + "\n")
+
+    # ------------------------------- overlay ---------------------------------- #
+
+    def showOverlay(self):
+        self.overlayVisible = True
+
+    def hideOverlay(self):
+        self.overlayVisible = False
+
+    def toggleOverlay(self):
+        self.overlayVisible = not self.overlayVisible
+
+    # draws average phase times of the last 30 frames in the top left corner of surface and returns the area drawn
+    def drawOverlay(self, surface):
+        if self.overlayFont == None:
+            self.overlayFont = resources.getFont("freesansbold.ttf", 14)
+
+        averages = self.getAverages(30)
+        lines = ["frame {:.2f} ms".format(averages["total"])]
+        for phase in PROFILER_PHASES:
+            lines.append("{} {:.2f} ms".format(phase, averages[phase]))
+
+        lineHeight = self.overlayFont.get_linesize()
+        overlay = pygame.Surface((170, (lineHeight * len(lines)) + 8))
+        overlay.fill((0, 0, 0))
+        for i, line in enumerate(lines):
+            overlay.blit(self.overlayFont.render(line, True, (0, 255, 0)), (4, 4 + (i * lineHeight)))
+        return surface.blit(overlay, (10, 10))
+
+
+"""
+    process-wide cache for fonts, images, rendered text, and sounds
+    assets are keyed by their file path plus whatever parameters change the loaded result
+    once the estimated memory of cached assets passes memoryBudget bytes, the least recently used assets are dropped
+    dropping an asset only removes the cache's reference, anything still using it keeps working
+    cached surfaces are shared, so draw onto a copy instead of onto a surface returned from the cache
+"""
+
+class ResourceManager(object):
+    def __init__(self, memoryBudget=128 * 1024 * 1024):
+        self.assets = OrderedDict()  # key -> (asset, estimated size in bytes), oldest first
+        self.atlases = []  # TextureAtlases searched for images before loading them from disk
+        self.memoryBudget = memoryBudget
+        self.memoryUsed = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # returns a pygame font, "freesansbold.ttf" is pygame's built in default font
+    def getFont(self, font="freesansbold.ttf", size=20):
+        def load():
+            loaded = pygame.font.Font(font, size)
+            # fonts are mostly the font file kept in memory, so use its size as the estimate
+            if isinstance(font, str) and os.path.isfile(font):
+                return loaded, os.path.getsize(font)
+            return loaded, FONT_SIZE_ESTIMATE
+
+        return self.__get(("font", font, size), load)
+
+    # returns an image converted to the display's format
+    # alpha=True uses convert_alpha() to keep transparency, alpha=False uses convert()
+    # decoded is image already loaded but not converted, used by AssetLoader so only the conversion happens here
+    # images packed into an atlas added with addAtlas() are returned as regions of the atlas when alpha is True
+    def getImage(self, image, alpha=True, decoded=None):
+        if alpha:
+            for atlas in self.atlases:
+                region = atlas.get(image)
+                if region != None:
+                    return region
+
+        def load():
+            loaded = decoded if decoded != None else pygame.image.load(image)
+            if alpha:
+                loaded = loaded.convert_alpha()
+            else:
+                loaded = loaded.convert()
+            return loaded, surfaceSize(loaded)
+
+        return self.__get(("image", image, alpha), load)
+
+    # returns text rendered with the font file and size, used for placeholder images
+    def getText(self, text, font="freesansbold.ttf", size=20, fgColor="black", bgColor=None, antialias=True):
+        def load():
+            rendered = self.getFont(font, size).render(text, antialias, fgColor, bgColor)
+            # match the display's pixel format so the text blits quickly
+            if pygame.display.get_surface() != None:
+                rendered = rendered.convert() if bgColor != None else rendered.convert_alpha()
+            return rendered, surfaceSize(rendered)
+
+        return self.__get(("text", text, font, size, fgColor, bgColor, antialias), load)
+
+    # returns a fully decoded pygame.mixer.Sound, the mixer must already be initialized
+    # data is the file's bytes already read, used by AssetLoader so the file is not read again
+    def getSound(self, filename, data=None):
+        def load():
+            loaded = pygame.mixer.Sound(filename) if data == None else pygame.mixer.Sound(file=io.BytesIO(data))
+            frequency, format, channels = pygame.mixer.get_init()
+            size = int(loaded.get_length() * frequency * channels * (abs(format) // 8))
+            return loaded, size
+
+        return self.__get(("sound", filename), load)
+
+    # getImage() returns images packed into atlas as regions of its pages instead of loading them separately
+    def addAtlas(self, atlas):
+        if atlas not in self.atlases:
+            self.atlases.append(atlas)
+
+    def removeAtlas(self, atlas):
+        if atlas in self.atlases:
+            self.atlases.remove(atlas)
+
+    # sets the memory budget in bytes and evicts assets until the cache fits in it
+    def setMemoryBudget(self, memoryBudget):
+        self.memoryBudget = memoryBudget
+        self.__evict()
+
+    # returns hit, miss, and memory statistics for the cache
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": (self.hits / lookups) if lookups > 0 else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.assets),
+            "memoryUsed": self.memoryUsed,
+            "memoryBudget": self.memoryBudget,
+        }
+
+    # removes every asset from the cache and resets statistics
+    def clear(self):
+        self.assets.clear()
+        self.memoryUsed = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # returns cached asset for key, or calls load() to create it and adds it to the cache
+    def __get(self, key, load):
+        entry = self.assets.get(key)
+        if entry != None:
+            self.hits += 1
+            self.assets.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        asset, size = load()
+        self.assets[key] = (asset, size)
+        self.memoryUsed += size
+        self.__evict()
+        return asset
+
+    # drops least recently used assets until memory used fits in budget, always keeping the newest asset
+    def __evict(self):
+        while (self.memoryUsed > self.memoryBudget) and (len(self.assets) > 1):
+            key, (asset, size) = self.assets.popitem(last=False)
+            self.memoryUsed -= size
+            self.evictions += 1
+
+
+"""
+    cache of rotated and scaled images shared by every sprite
+    images are keyed by their source surface, angle rounded to the nearest angleStep degrees, and scale
+    an angle of 0 with a scale of 1 returns the source image without transforming or caching it
+    once more than maxEntries images are cached, the least recently used one is dropped
+"""
+
+class TransformCache(object):
+    def __init__(self, maxEntries=2048, angleStep=1):
+        self.images = OrderedDict()  # (source, angle, scale) -> transformed surface, oldest first
+        self.maxEntries = maxEntries
+        self.angleStep = angleStep
+        self.hits = 0
+        self.misses = 0
+
+    # returns source rotated by angle degrees and scaled by scale
+    def get(self, source, angle, scale=1):
+        angle = (round(angle / self.angleStep) * self.angleStep) % 360
+        if (angle == 0) and (scale == 1):
+            return source
+
+        key = (source, angle, scale)
+        image = self.images.get(key)
+        if image != None:
+            self.hits += 1
+            self.images.move_to_end(key)
+            return image
+
+        self.misses += 1
+        image = source
+        if scale != 1:
+            image = pygame.transform.scale_by(image, scale)
+        if angle != 0:
+            image = pygame.transform.rotate(image, angle)
+
+        self.images[key] = image
+        if len(self.images) > self.maxEntries:
+            self.images.popitem(last=False)
+        return image
+
+    # sets how finely angles are rounded in degrees, larger steps cache fewer images
+    def setAngleStep(self, angleStep):
+        self.angleStep = angleStep
+        self.clear()
+
+    # sets the most transformed images kept at once
+    def setMaxEntries(self, maxEntries):
+        self.maxEntries = maxEntries
+        while len(self.images) > self.maxEntries:
+            self.images.popitem(last=False)
+
+    def getStats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.images),
+            "maxEntries": self.maxEntries,
+        }
+
+    def clear(self):
+        self.images.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+"""
+    caches the pixel mask of every image used in pixel-perfect collisions
+    animation cells and cached rotations are shared between sprites, so each mask is built once for every sprite showing it
+    masks are kept per surface, and the least recently used ones are dropped past maxEntries
+    sprites that are not pixel-perfect collide as their whole rect, tested with a solid mask of that size
+"""
+
+class MaskCache(object):
+    def __init__(self, maxEntries=2048):
+        self.masks = OrderedDict()  # surface -> mask of its opaque pixels, oldest first
+        self.solidMasks = {}  # (width, height) -> mask with every bit set
+        self.maxEntries = maxEntries
+        self.hits = 0  # masks found in the cache
+        self.misses = 0  # masks built from a surface
+        self.tests = 0  # sprite pairs whose rects overlapped and were tested pixel by pixel
+        self.overlaps = 0  # tested pairs whose pixels overlapped
+
+    # returns the mask of surface's opaque pixels, building it the first time surface is seen
+    def get(self, surface):
+        mask = self.masks.get(surface)
+        if mask != None:
+            self.hits += 1
+            self.masks.move_to_end(surface)
+            return mask
+
+        self.misses += 1
+        mask = pygame.mask.from_surface(surface)
+        self.masks[surface] = mask
+        if len(self.masks) > self.maxEntries:
+            self.masks.popitem(last=False)
+        return mask
+
+    # returns the mask a sprite collides with, its image's pixels if it is pixel-perfect or else its whole rect
+    def getSpriteMask(self, sprite):
+        if getattr(sprite, "pixelPerfect", False):
+            return self.get(sprite.image)
+        size = sprite.rect.size
+        mask = self.solidMasks.get(size)
+        if mask == None:
+            mask = pygame.mask.Mask(size, fill=True)
+            self.solidMasks[size] = mask
+        return mask
+
+    # narrow phase: returns True if the pixels of sprites a and b overlap, for sprites whose rects already overlap
+    def overlap(self, a, b):
+        self.tests += 1
+        offset = (b.rect.left - a.rect.left, b.rect.top - a.rect.top)
+        if self.getSpriteMask(a).overlap(self.getSpriteMask(b), offset) == None:
+            return False
+        self.overlaps += 1
+        return True
+
+    # sets the most masks kept at once
+    def setMaxEntries(self, maxEntries):
+        self.maxEntries = maxEntries
+        while len(self.masks) > self.maxEntries:
+            self.masks.popitem(last=False)
+
+    # rejected is how many pairs overlapped as rects but not as pixels
+    def getStats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.masks),
+            "maxEntries": self.maxEntries,
+            "tests": self.tests,
+            "overlaps": self.overlaps,
+            "rejected": self.tests - self.overlaps,
+        }
+
+    def clear(self):
+        self.masks.clear()
+        self.solidMasks.clear()
+        self.hits = 0
+        self.misses = 0
+        self.tests = 0
+        self.overlaps = 0
+
+
+"""
+    returns True if sprites a and b collide, used as pygame's collided callback by Sprite.collidesWithGroup()
+    rects are tested first, and pixel masks only when either sprite is pixel-perfect
+"""
+
+def collideSprites(a, b):
+    if not a.rect.colliderect(b.rect):
+        return False
+    if getattr(a, "pixelPerfect", False) or getattr(b, "pixelPerfect", False):
+        return masks.overlap(a, b)
+    return True
+
+
+"""
+    named list of animation cells shared by reference between every sprite playing it
+    frameRate is how many cells play per second unless a sprite sets its own speed
+    sprites only keep a playhead, so many sprites playing one clip use no more memory than one
+"""
+
+class AnimationClip(object):
+    def __init__(self, frames, frameRate=15, loop=True, name=None):
+        self.frames = list(frames)
+        self.frameRate = frameRate
+        self.loop = loop
+        self.name = name
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    # returns index of the cell shown position cells after the clip started, wrapping or holding the last cell
+    def getFrameIndex(self, position):
+        index = int(position)
+        if self.loop:
+            return index % len(self.frames)
+        return min(index, len(self.frames) - 1)
+
+    # returns how many seconds the clip takes to play once
+    def getDuration(self):
+        return len(self.frames) / self.frameRate
+
+
+"""
+    creates each AnimationClip once per spritesheet, cell layout, and scale and shares it with every sprite that asks
+    clips can also be registered under a name with add() and looked up with get()
+"""
+
+class ClipRegistry(object):
+    def __init__(self):
+        self.clips = {}  # (sheet, numCells, cellWidth, cellHeight, cellLeft, cellTop, cellScalar) -> clip
+        self.namedClips = {}  # name -> clip
+        self.hits = 0
+        self.misses = 0
+
+    # returns the clip of numCells cells in a row cut from sheet, starting at cellLeft, cellTop
+    def getClip(self, sheet, numCells, cellWidth, cellHeight, cellLeft=0, cellTop=0, cellScalar=1):
+        key = (sheet, numCells, cellWidth, cellHeight, cellLeft, cellTop, cellScalar)
+        clip = self.clips.get(key)
+        if clip != None:
+            self.hits += 1
+            return clip
+
+        self.misses += 1
+        frames = []
+        left = cellLeft
+        for i in range(numCells):
+            # create cell using sheet as spritesheet
+            cell = sheet.subsurface((left, cellTop, cellWidth, cellHeight))
+            if cellScalar != 1:
+                cell = pygame.transform.scale_by(cell, cellScalar)
+            frames.append(cell)
+
+            # start next cell at top right corner of this cell
+            left += cellWidth
+
+        clip = AnimationClip(frames)
+        self.clips[key] = clip
+        return clip
+
+    def add(self, name, clip):
+        clip.name = name
+        self.namedClips[name] = clip
+
+    # returns clip added with name, or None
+    def get(self, name):
+        return self.namedClips.get(name)
+
+    # returns number of clips, their cells, and bytes used by cells that are not views into a sheet
+    def getStats(self):
+        allClips = list(self.clips.values()) + list(self.namedClips.values())
+        uniqueFrames = {id(frame): frame for clip in allClips for frame in clip.frames}
+        return {
+            "clips": len(self.clips) + len(self.namedClips),
+            "frames": len(uniqueFrames),
+            "frameMemory": sum(surfaceSize(frame) for frame in uniqueFrames.values() if frame.get_parent() == None),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        self.clips.clear()
+        self.namedClips.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+"""
+    packs many small images into a few large page surfaces and hands back subsurface regions of the pages
+    images are placed with a skyline bottom-left packer, tallest first, opening a new page when one is full
+    regions can be given to Sprite.setImageSurface(), or the atlas can be added to the resource cache with
+    resources.addAtlas() so Sprite.setImage() and createAnimation() use its regions for packed image files
+    atlases are built at load time with build(), or saved with save() and loaded pre-baked with load()
+"""
+
+class TextureAtlas(object):
+    def __init__(self, maxSize=2048, padding=1):
+        self.maxSize = maxSize  # largest width and height of a page
+        self.padding = padding  # empty pixels kept between images so scaling does not bleed neighbours in
+        self.pending = []  # (name, surface) added but not packed yet
+        self.pages = []  # page surfaces
+        self.regions = {}  # name -> (page index, rect)
+        self.subsurfaces = {}  # name -> subsurface of its page
+        self.packedArea = 0  # pixels covered by packed images, without padding
+
+    # adds an image file to pack, named by its path so resources.getImage() can find it
+    def addImage(self, image):
+        self.addSurface(image, pygame.image.load(image))
+
+    def addImages(self, images):
+        for image in images:
+            self.addImage(image)
+
+    def addSurface(self, name, surface):
+        if (surface.get_width() + self.padding > self.maxSize) or (surface.get_height() + self.padding > self.maxSize):
+            raise ValueError("image {} is larger than the atlas's {} pixel pages".format(name, self.maxSize))
+        self.pending.append((name, surface))
+
+    """
+        packs every image added since the last build onto new pages
+        images already packed keep their regions, so build() can be called again after adding more images
+    """
+
+    def build(self):
+        if not self.pending:
+            return
+        padding = self.padding
+        items = sorted(self.pending, key=lambda item: (item[1].get_height(), item[1].get_width()), reverse=True)
+
+        skylines = []  # [x, y, width] segments of each new page's skyline, left to right
+        placements = []  # (name, surface, new page index, x, y)
+        for name, surface in items:
+            width = surface.get_width() + padding
+            height = surface.get_height() + padding
+            for page, skyline in enumerate(skylines):
+                position = self.__findPosition(skyline, width, height)
+                if position != None:
+                    break
+            else:
+                page = len(skylines)
+                skylines.append([[0, 0, self.maxSize]])
+                position = self.__findPosition(skylines[page], width, height)
+            self.__place(skylines[page], position[0], position[1], width, height)
+            placements.append((name, surface, page, position[0], position[1]))
+
+        # pages are only as large as the images packed onto them
+        firstPage = len(self.pages)
+        extents = [[0, 0] for skyline in skylines]
+        for name, surface, page, x, y in placements:
+            extents[page][0] = max(extents[page][0], x + surface.get_width())
+            extents[page][1] = max(extents[page][1], y + surface.get_height())
+        for width, height in extents:
+            page = pygame.Surface((width, height), pygame.SRCALPHA)
+            if pygame.display.get_surface() != None:
+                page = page.convert_alpha()
+            page.fill((0, 0, 0, 0))
+            self.pages.append(page)
+
+        for name, surface, page, x, y in placements:
+            rect = pygame.Rect(x, y, surface.get_width(), surface.get_height())
+            self.pages[firstPage + page].blit(surface, rect)
+            self.__addRegion(name, firstPage + page, rect)
+        self.pending = []
+
+    # returns the region of the page name was packed onto, or None if name is not in the atlas
+    def get(self, name):
+        return self.subsurfaces.get(name)
+
+    def getNames(self):
+        return list(self.regions)
+
+    # returns number of pages and images, packing efficiency (0 to 1), and bytes used by the pages
+    def getStats(self):
+        pageArea = sum(page.get_width() * page.get_height() for page in self.pages)
+        return {
+            "pages": len(self.pages),
+            "images": len(self.regions),
+            "efficiency": (self.packedArea / pageArea) if pageArea > 0 else 0.0,
+            "textureMemory": sum(surfaceSize(page) for page in self.pages),
+        }
+
+    """
+        saves the pages as PNG images next to filename and the regions as JSON in filename
+        pages are named after filename, so "ui.json" saves "ui_0.png", "ui_1.png", ...
+    """
+
+    def save(self, filename):
+        self.build()
+        base = os.path.splitext(filename)[0]
+        pageFiles = []
+        for i, page in enumerate(self.pages):
+            pageFile = "{}_{}.png".format(base, i)
+            pygame.image.save(page, pageFile)
+            pageFiles.append(os.path.basename(pageFile))
+
+        regions = {name: [page, rect.x, rect.y, rect.width, rect.height] for name, (page, rect) in self.regions.items()}
+        with open(filename, "w") as file:
+            json.dump({"pages": pageFiles, "regions": regions}, file)
+
+    # adds the pages and regions of an atlas saved with save(), without packing anything again
+    def load(self, filename):
+        with open(filename) as file:
+            saved = json.load(file)
+
+        firstPage = len(self.pages)
+        folder = os.path.dirname(filename)
+        for pageFile in saved["pages"]:
+            self.pages.append(resources.getImage(os.path.join(folder, pageFile)))
+        for name, (page, x, y, width, height) in saved["regions"].items():
+            self.__addRegion(name, firstPage + page, pygame.Rect(x, y, width, height))
+
+    def __addRegion(self, name, page, rect):
+        if name in self.regions:
+            self.packedArea -= self.regions[name][1].width * self.regions[name][1].height
+        self.regions[name] = (page, rect)
+        self.subsurfaces[name] = self.pages[page].subsurface(rect)
+        self.packedArea += rect.width * rect.height
+
+    # returns lowest (x, y) on skyline a width x height image fits at, preferring the left, or None
+    def __findPosition(self, skyline, width, height):
+        best = None
+        for i in range(len(skyline)):
+            x = skyline[i][0]
+            if x + width > self.maxSize:
+                break
+            # the image rests on the highest segment under it
+            y = 0
+            covered = 0
+            j = i
+            while covered < width:
+                y = max(y, skyline[j][1])
+                covered += skyline[j][2]
+                j += 1
+            if (y + height <= self.maxSize) and ((best == None) or (y < best[1])):
+                best = (x, y)
+        return best
+
+    # raises skyline under the image placed at x, y and merges segments of the same height
+    def __place(self, skyline, x, y, width, height):
+        right = x + width
+        segments = []
+        for segmentX, segmentY, segmentWidth in skyline:
+            segmentRight = segmentX + segmentWidth
+            if segmentX < x:
+                segments.append([segmentX, segmentY, min(segmentRight, x) - segmentX])
+            if segmentX <= x < segmentRight:
+                segments.append([x, y + height, width])
+            if segmentRight > right:
+                start = max(segmentX, right)
+                segments.append([start, segmentY, segmentRight - start])
+
+        skyline[:] = []
+        for segment in segments:
+            if skyline and (skyline[-1][1] == segment[1]):
+                skyline[-1][2] += segment[2]
+            else:
+                skyline.append(segment)
+
+
+"""
+    loads a scene's images and sounds on a pool of worker threads before the scene is created
+    workers only read and decode files, converting images to the display's format happens on the main thread
+    once every file has been decoded, so the game keeps running frames, like a LoadingScene, while files load
+    loaded assets are added to the shared resource cache, so Sprite.setImage(), Map.setMapImage(), and Sound find them
+    images for setMapImage() should be added with alpha=False to match how maps load them
+"""
+
+class AssetLoader(object):
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.images = []  # (image, alpha) to load
+        self.sounds = []  # sound filenames to load
+        self.executor = None
+        self.futures = []  # (kind, name, alpha, future) of every file given to the workers
+        self.numDecoded = 0
+        self.done = False
+
+    def addImage(self, image, alpha=True):
+        self.images.append((image, alpha))
+
+    def addImages(self, images, alpha=True):
+        for image in images:
+            self.addImage(image, alpha)
+
+    def addSound(self, filename):
+        self.sounds.append(filename)
+
+    # gives every added file to the worker threads, called by update() if it has not been called yet
+    def start(self):
+        if self.executor != None:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        for image, alpha in self.images:
+            self.futures.append(("image", image, alpha, self.executor.submit(pygame.image.load, image)))
+        for filename in self.sounds:
+            self.futures.append(("sound", filename, None, self.executor.submit(self.__readFile, filename)))
+
+    """
+        checks on the workers without waiting for them and returns progress
+        once every file is decoded, converts and caches them all, then isDone() returns True
+        errors from loading a file are raised here, on the main thread
+    """
+
+    def update(self):
+        self.start()
+        if not self.done:
+            self.numDecoded = sum(1 for kind, name, alpha, future in self.futures if future.done())
+            if self.numDecoded == len(self.futures):
+                self.__finish()
+        return self.getProgress()
+
+    # returns fraction (0 to 1) of files loaded
+    def getProgress(self):
+        if self.done or not self.futures:
+            return 1.0 if self.done else 0.0
+        return self.numDecoded / (len(self.futures) + 1)  # the last step is converting on the main thread
+
+    def isDone(self):
+        return self.done
+
+    # loads every file, waiting for the workers to finish
+    def wait(self):
+        self.start()
+        for kind, name, alpha, future in self.futures:
+            future.result()
+        self.update()
+
+    # converts decoded images and sounds on the main thread and adds them to the resource cache
+    def __finish(self):
+        for kind, name, alpha, future in self.futures:
+            if kind == "image":
+                resources.getImage(name, alpha, decoded=future.result())
+            else:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                resources.getSound(name, data=future.result())
+        self.executor.shutdown(wait=False)
+        self.done = True
+
+    @staticmethod
+    def __readFile(filename):
+        with open(filename, "rb") as file:
+            return file.read()
+
+
+"""
+    scene shown while an AssetLoader loads the assets of the next scene, drawing a label and a progress bar
+    nextScene is the key of the scene to go to once loading is done, a scene, or a function that creates and
+    returns the scene so it is only created once its assets are in the resource cache
+    the loading scene replaces itself with the next scene and releases its surfaces
+"""
+
+class LoadingScene(Scene):
+    def __init__(self, game, loader, nextScene, text="Loading..."):
+        Scene.__init__(self, game, Map())
+        self.loader = loader
+        self.nextScene = nextScene
+        self.finished = False
+
+        self.label = Label(self, text)
+        self.label.setTextColor("white")
+        self.label.setBackgroundColor("black")
+        self.label.setPosition((.5 * game.getWindowWidth(), (.5 * game.getWindowHeight()) - 40))
+        self.addSprite(self.label)
+
+        # progress bar is a blank label whose width follows the loader's progress
+        self.barWidth = 400
+        self.bar = Label(self, "")
+        self.bar.setBackgroundColor("white")
+        self.bar.height = 20
+        self.bar.width = 0
+        self.addSprite(self.bar)
+        self.__moveBar()
+
+    def enter__(self):
+        self.loader.start()
+
+    def update__(self):
+        progress = self.loader.update()
+        self.bar.width = int(self.barWidth * progress)
+        self.__moveBar()
+
+        if self.loader.isDone() and not self.finished:
+            self.finished = True
+            nextScene = self.nextScene
+            if callable(nextScene) and not isinstance(nextScene, Scene):
+                nextScene = nextScene()
+            self.game.replaceScene(nextScene, release=True)
+
+    # keeps the bar's left edge in place as it grows
+    def __moveBar(self):
+        left = .5 * (self.game.getWindowWidth() - self.barWidth)
+        self.bar.setPosition((left + (.5 * self.bar.width), (.5 * self.game.getWindowHeight()) + 10))
+
+
+"""
+    runs one scene at a time for simulations with a gym style reset() and step() API
+    createScene is called with the game to build a fresh scene on every reset(), so each run starts from scratch
+    a scene ends its run by calling stop(), after which isDone() is True until the next reset()
+    game defaults to a new headless Game when there is no display yet, several envs can share one game
+    a new Game would replace a running game's window, so inside a running game the game must be passed
+"""
+
+class SceneEnv(object):
+    def __init__(self, createScene, game=None):
+        if game == None:
+            if pygame.display.get_surface() != None:
+                raise ValueError("a display already exists, pass its Game to SceneEnv instead of creating a headless one")
+            game = Game(headless=True)
+        self.createScene = createScene
+        self.game = game
+        self.scene = None
+        self.observation = None  # observation of the last reset() or step()
+        self.numSteps = 0  # steps since the last reset()
+
+    # builds a new scene, releasing the old one, and returns its first observation
+    def reset(self):
+        if self.scene != None:
+            self.scene.release()
+        self.scene = self.createScene(self.game)
+        self.numSteps = 0
+        self.observation = self.scene.observe__()
+        return self.observation
+
+    # advances the scene one frame with actions and returns its observation
+    def step(self, actions=None):
+        self.observation = self.scene.step(actions)
+        self.numSteps += 1
+        return self.observation
+
+    # returns True once the scene has stopped itself
+    def isDone(self):
+        return (self.numSteps > 0) and not self.scene.keepGoing
+
+    def getScene(self):
+        return self.scene
+
+
+"""
+    steps numEnvs independent scenes at once, spread over numProcesses worker processes
+    numProcesses defaults to one per CPU, each worker runs a headless Game and steps its share of the envs in turn
+    createScene and policies are sent to the workers, so they must be module level functions or classes like a Scene subclass
+    workers are spawned rather than forked so they never inherit the parent's window or sound device
+    envs that finish a run are reset in their worker, so the batch always has numEnvs running scenes
+    the runner is a context manager that closes its workers on exit
+"""
+
+class VectorSceneRunner(object):
+    def __init__(self, createScene, numEnvs, numProcesses=None):
+        if numProcesses == None:
+            numProcesses = os.cpu_count() or 1
+        numProcesses = max(min(numProcesses, numEnvs), 1)
+        self.numEnvs = numEnvs
+
+        # split envs as evenly as possible between workers
+        self.counts = [(numEnvs // numProcesses) + (1 if i < numEnvs % numProcesses else 0) for i in range(numProcesses)]
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for count in self.counts:
+            connection, workerConnection = context.Pipe()
+            process = context.Process(target=runSceneEnvs, args=(workerConnection, createScene, count), daemon=True)
+            process.start()
+            workerConnection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # resets every env and returns the list of their first observations
+    def reset(self):
+        return self.__flatten(self.__request("reset", [None] * len(self.counts)))
+
+    """
+        advances every env one frame and returns (observations, dones), lists with one entry per env
+        actions is a list with each env's actions, or None to step every env with None
+        an env that finished is reset, its observation is the first one of its new run and its done is True
+    """
+
+    def step(self, actions=None):
+        if actions == None:
+            actions = [None] * self.numEnvs
+        results = self.__flatten(self.__request("step", self.__split(actions)))
+        return [result[0] for result in results], [result[1] for result in results]
+
+    """
+        steps every env numSteps frames inside the workers, sending no messages between frames
+        policy is called with an env's observation and returns its actions, or is None to step with None
+        returns (observations, runs), each env's last observation and how many runs finished
+    """
+
+    def run(self, numSteps, policy=None):
+        results = self.__flatten(self.__request("run", [(numSteps, policy)] * len(self.counts)))
+        return [result[0] for result in results], sum(result[1] for result in results)
+
+    def getNumEnvs(self):
+        return self.numEnvs
+
+    def getNumProcesses(self):
+        return len(self.processes)
+
+    # stops the workers, the runner cannot be used afterwards
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+
+    # private method: sends each worker its command, then waits for every reply so workers run in parallel
+    def __request(self, command, data):
+        for connection, workerData in zip(self.connections, data):
+            connection.send((command, workerData))
+        replies = []
+        for connection in self.connections:
+            status, reply = connection.recv()
+            if status == "error":
+                raise RuntimeError("scene worker failed:\n" + reply)
+            replies.append(reply)
+        return replies
+
+    # private method: splits a list with one entry per env into one list per worker
+    def __split(self, values):
+        if len(values) != self.numEnvs:
+            raise ValueError("expected {} actions, got {}".format(self.numEnvs, len(values)))
+        chunks = []
+        start = 0
+        for count in self.counts:
+            chunks.append(values[start:start + count])
+            start += count
+        return chunks
+
+    # private method: joins the workers' lists back into one list per env
+    def __flatten(self, replies):
+        return [value for reply in replies for value in reply]
+
+"""
+    worker process of a VectorSceneRunner, runs numEnvs SceneEnvs on one headless Game
+    answers each command sent over connection with ("ok", result), or ("error", traceback) if it raised
+"""
+
+def runSceneEnvs(connection, createScene, numEnvs):
+    game = Game(headless=True)
+    envs = [SceneEnv(createScene, game) for i in range(numEnvs)]
+    for env in envs:
+        env.reset()
+    while True:
+        command, data = connection.recv()
+        if command == "close":
+            break
+        try:
+            if command == "reset":
+                result = [env.reset() for env in envs]
+            elif command == "step":
+                result = []
+                for env, actions in zip(envs, data):
+                    observation = env.step(actions)
+                    done = env.isDone()
+                    if done:
+                        observation = env.reset()
+                    result.append((observation, done))
+            elif command == "run":
+                numSteps, policy = data
+                result = []
+                for env in envs:
+                    runs = 0
+                    for i in range(numSteps):
+                        env.step(policy(env.observation) if policy != None else None)
+                        if env.isDone():
+                            runs += 1
+                            env.reset()
+                    result.append((env.observation, runs))
+            else:
+                raise ValueError("unknown command: {}".format(command))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+        else:
+            connection.send(("ok", result))
+    connection.close()
+
+
+"""
+    merges rects that overlap into their union until no two rects overlap
+    rects are clipped to clipRect and empty rects are dropped
+"""
+
+def mergeRects(rects, clipRect):
+    merged = []
+    for rect in rects:
+        rect = clipRect.clip(rect)
+        if (rect.width <= 0) or (rect.height <= 0):
+            continue
+
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+"""
+    swept AABB test of the box between left, top, right, and bottom moving by dx, dy against rect
+    returns (time, normalX, normalY) where time (0 to 1) is when the box first touches rect, or None if it does not
+    boxes sliding along an edge of rect or moving away from it do not hit it
+    a box that starts inside rect hits it at time 0 on the side it is moving into
+"""
+
+def sweepRect(left, top, right, bottom, dx, dy, rect):
+    if (dx == 0) and (dy == 0):
+        return None
+
+    # times the box enters and leaves rect's extent along each axis
+    if dx > 0:
+        entryX = (rect.left - right) / dx
+        exitX = (rect.right - left) / dx
+    elif dx < 0:
+        entryX = (rect.right - left) / dx
+        exitX = (rect.left - right) / dx
+    elif (right <= rect.left) or (left >= rect.right):
+        return None
+    else:
+        entryX = -math.inf
+        exitX = math.inf
+
+    if dy > 0:
+        entryY = (rect.top - bottom) / dy
+        exitY = (rect.bottom - top) / dy
+    elif dy < 0:
+        entryY = (rect.bottom - top) / dy
+        exitY = (rect.top - bottom) / dy
+    elif (bottom <= rect.top) or (top >= rect.bottom):
+        return None
+    else:
+        entryY = -math.inf
+        exitY = math.inf
+
+    entry = max(entryX, entryY)
+    exit = min(exitX, exitY)
+    if (entry >= exit) or (entry > 1) or (exit <= 0):
+        return None
+    if entryX > entryY:
+        return (max(entry, 0), -1 if dx > 0 else 1, 0)
+    return (max(entry, 0), 0, -1 if dy > 0 else 1)
+
+# rounds halves away from zero like pygame does when a rect is positioned with floats
+def roundHalfAway(values):
+    whole = numpy.trunc(values)
+    return whole + numpy.copysign(numpy.abs(values - whole) >= .5, values)
+
+# estimated memory in bytes of a font that was not loaded from a file on disk
+FONT_SIZE_ESTIMATE = 100 * 1024
+
+# returns estimated memory in bytes of a surface's pixels
+def surfaceSize(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+# shared resource cache used by sprites, maps, labels, and sounds
+resources = ResourceManager()
+
+# shared cache of rotated and scaled sprite images
+transforms = TransformCache()
+
+# shared cache of pixel masks for pixel-perfect collisions
+masks = MaskCache()
+
+# shared animation clips cut from spritesheets
+clips = ClipRegistry()
+
+# shared pool of mixer channels every Sound plays on
+audio = SoundEngine()
+
+
 if __name__ == "__main__":
     # all you need to start building your game is two lines
     game = Game()
+
+    # "python3 pyEngine.py 50000" bounces that many extra DVD logos using a SpriteBatch
+    if len(sys.argv) > 1:
+        batch = SpriteBatch(game.currentScene)
+        batch.setImage("dvd.jpeg")
+        numLogos = int(sys.argv[1])
+        batch.addMany([random.uniform(100, 980) for i in range(numLogos)],
+                      [random.uniform(100, 620) for i in range(numLogos)],
+                      4, [random.uniform(0, 360) for i in range(numLogos)], BOUNCE)
+        game.currentScene.addBatch(batch)
+
     game.start()
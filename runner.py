@@ -91,11 +91,9 @@ class gameScene(pyEngine.Scene):
 
     def checkEvents__(self, event):
         if self.end == False:
-            keys = pygame.key.get_pressed()
-            if self.runner.y >= 520:
-                if keys[pygame.K_SPACE]:
-                    self.runner.addDY(-6)
-                    self.jumpSound.play()
+            keys = self.getKeys()
+            if keys[pygame.K_SPACE]:
+                self.jump()
 
             if self.hurdle.collidesWithGroup(self.tileGroup and self.addScore):
                 print("collided tiles")
@@ -112,6 +110,22 @@ class gameScene(pyEngine.Scene):
 
             self.init = True
 
+    def jump(self):
+        if self.runner.y >= 520:
+            self.runner.addDY(-6)
+            self.jumpSound.play()
+
+    # simulation hooks used by Scene.step(), actions is True to jump
+    # a simulated run ends when the runner hits the hurdle
+    def act__(self, actions):
+        if actions:
+            self.jump()
+        if self.runner.collidesWith(self.hurdle):
+            self.stop()
+
+    def observe__(self):
+        return (self.runner.y, self.runner.dy, self.hurdle.x)
+
     def update__(self):
         # runner gravity
         if (self.runner.y < 520):
@@ -122,13 +136,20 @@ def main():
     game = pyEngine.Game()
     game.setTitle("pyEngine Runner")
 
-    start = startScene(game)
-    scene = gameScene(game)
+    # decode the game's images and sounds in the background while the loading scene runs
+    loader = pyEngine.AssetLoader()
+    loader.addImages(["stadium.jpeg", "track.jpeg"], alpha=False)
+    loader.addImages(["runnerSpritesheet.png", "hurdle.png"])
+    loader.addSound("Jump.wav")
 
-    game.addScene("startScene", start)
-    game.addScene("gameScene", scene)
+    # scenes are created once their assets are loaded
+    def createScenes():
+        game.addScene("startScene", startScene(game))
+        game.addScene("gameScene", gameScene(game))
+        return "startScene"
 
-    game.setCurrentScene("startScene")
+    game.addScene("loadingScene", pyEngine.LoadingScene(game, loader, createScenes))
+    game.setCurrentScene("loadingScene")
     game.start()
 
 if __name__ == "__main__":